@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+from multiprocessing import Pool
+from random import Random
+from time import perf_counter
+import pyxel
+from game_manager import GameManager
+from pilots import PILOTS
+
+# This is the batch simulator used to balance the waves
+# It plays many headless games at once, spread over a pool of processes (one per core by default),
+# each one flown by a scripted pilot from pilots.py instead of the keyboard
+# Every game is independent and seeded, so a single game can be rerun on its own with the same seed
+# and the results don't depend on the number of processes
+# Only real cores speed it up, more processes than cores just add the cost of switching between them,
+# and with a single process the games are played in this one without a pool
+
+
+def run_game(job):
+    # Plays one headless game until the player dies, wins or max_frames is reached
+    # job is a (seed, pilot name, max frames) tuple so it can be sent to another process
+    seed, pilot_name, max_frames = job
+    # The games are only looked at once they end, so the frame profiler is left off
+    game = GameManager(256, 256, headless=True, seed=seed, profile=False)
+    # The pilot gets its own generator so it doesn't change the random choices of the game
+    pilot = PILOTS[pilot_name](Random(seed))
+
+    # Leaves the title screen
+    game.step(1, {pyxel.KEY_RETURN})
+    frames = 0
+    while game.scene == "PLAY" and frames < max_frames:
+        game.step(1, pilot.keys(game))
+        frames += 1
+
+    return {
+        "seed": seed,
+        "pilot": pilot_name,
+        "score": game.score,
+        "waves_cleared": game.waves_cleared,
+        "lives_lost": game.lives_lost,
+        "frames_survived": frames,
+        "result": game.scene,
+    }
+
+
+def run_batch(games, pilot_name, max_frames=10000, first_seed=0, workers=None):
+    # Plays the games over a process pool and yields each result as soon as its game ends
+    # Results arrive in whatever order the games finish
+    jobs = [(seed, pilot_name, max_frames) for seed in range(first_seed, first_seed + games)]
+    workers = min(workers or os.cpu_count(), games)
+    if workers <= 1:
+        for job in jobs:
+            yield run_game(job)
+        return
+    # Games are handed out a few at a time to keep the processes busy without much overhead
+    chunk_size = max(1, games // (workers * 8))
+    with Pool(workers) as pool:
+        for result in pool.imap_unordered(run_game, jobs, chunk_size):
+            yield result
+
+
+def aggregate(results):
+    # Sums up a list of game results
+    count = len(results)
+    if count == 0:
+        return {"games": 0}
+    summary = {"games": count}
+    for key in ["score", "waves_cleared", "lives_lost", "frames_survived"]:
+        values = [result[key] for result in results]
+        summary[key] = {
+            "mean": sum(values) / count,
+            "min": min(values),
+            "max": max(values),
+        }
+    summary["wins"] = sum(1 for result in results if result["result"] == "WIN")
+    return summary
+
+
+# Running "python batch.py --games 1000 --pilot dodge" plays 1000 games on every core
+# and prints the summary, --jsonl also prints every game's result as a line of JSON while they finish
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays many headless games with scripted pilots")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--pilot", choices=sorted(PILOTS), default="dodge", help="pilot flying every game")
+    parser.add_argument("--max-frames", type=int, default=10000, help="frames after which a game is stopped")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the rest count up from it")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: one per core)")
+    parser.add_argument("--jsonl", action="store_true", help="print every game's result as it finishes")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    results = []
+    for result in run_batch(args.games, args.pilot, args.max_frames, args.seed, args.workers):
+        results.append(result)
+        if args.jsonl:
+            print(json.dumps(result), flush=True)
+    elapsed = perf_counter() - start
+
+    summary = aggregate(results)
+    summary["seconds"] = elapsed
+    summary["frames_per_second"] = sum(result["frames_survived"] for result in results) / elapsed
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+import numpy as np
+from random import Random
+from statistics import median
+from time import perf_counter
+import pyxel
+from game_manager import GameManager
+from enemy import RegularEnemy, SuperBombardier
+from patterns import PATTERNS
+from world import World
+from cluster_handler import FORMATIONS, OccupancyGrid
+from particles import Explosions, Debris
+from snapshot import RewindBuffer
+from timeline import Level
+from config import BLAST_POOL_SIZE, DEBRIS_POOL_SIZE
+
+# This is the benchmark suite, it builds stress scenarios out of the real game classes and times them
+# For every scenario it reports the update and draw time per frame, the memory a frame allocates, the memory
+# blocks left allocated after each frame and the peak memory used, and compares them against a saved baseline
+# to catch regressions
+#
+#     python benchmark.py --save          runs every scenario and saves the results as the baseline
+#     python benchmark.py                 runs every scenario and flags anything slower than the baseline
+#
+# Drawing needs pyxel.init, which needs a display; --no-draw skips it on machines without one
+#
+# Every scenario is run several times (--repeats) from scratch, its first frames (--warmup) untimed, and the
+# fastest run is kept, a busy machine only ever makes a run slower so the fastest is the least noisy
+# The memory figures come out the same on every run and are held to a tight threshold (--memory-threshold),
+# the timings still varied by up to half from one whole run of the suite to the next on a shared single
+# core machine, so they are allowed a 50% slowdown (--threshold) and a flagged scenario is run again first
+#
+# The committed benchmark_baseline.json was made with "python benchmark.py --no-draw --save" (the default
+# frames, repeats and warmup, no draw timings), so compare against it with "python benchmark.py --no-draw"
+# Timings depend on the machine, save a baseline of your own before comparing timings across changes
+
+# Folder of this file, the assets and the default baseline are found from it
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "benchmark_baseline.json")
+
+
+def new_game(seed=0):
+    # Headless game which has left the title screen, with lives to spare so it never ends mid benchmark
+    game = GameManager(256, 256, headless=True, seed=seed)
+    game.scene = "PLAY"
+    game.lives = 10 ** 9
+    return game
+
+
+# Every scenario builds its objects and returns an (update, draw) pair of functions for one frame
+
+def spawn_packed_formation(world, count):
+    # Spawns a grid formation (from cluster_handler.FORMATIONS) of count regular enemies, packed 9 by 5
+    # pixels apart instead of a plane size so all of them fit on the screen
+    # The formation hovers in place, so every plane stays alive and on screen for the whole run
+    # (its leader still runs its motion system, by a speed of 0, and the followers still follow it)
+    cells_of, bounds = FORMATIONS["grid"]
+    cells = cells_of(count, OccupancyGrid(*bounds(count)), None)
+    offsets = [(col * 9, row * 5) for col, row in cells[1:]]
+    world.clear()
+    for formation in world.build_formation(RegularEnemy, 4, 4, offsets):
+        pass
+    world.speed[:count] = 0
+
+
+def regular_formation(count=500):
+    # count regular enemies packed in a formation, all shooting at the player
+    game = new_game()
+    spawn_packed_formation(game.world, count)
+    return game.tick, game.draw
+
+
+def rewind_formation(count=500):
+    # The same formation with every frame saved in a rewind buffer, the difference is the cost of the snapshots
+    game = new_game()
+    game.rewind = RewindBuffer()
+    spawn_packed_formation(game.world, count)
+    return game.tick, game.draw
+
+
+def super_bombardiers(count=20):
+    # count super bombardiers all firing their 8 way bursts at the same time, bullets tested against the plane
+    game = new_game()
+    world = World(game.rng, game.enemy_bullets)
+    for i in range(count):
+        world.spawn(SuperBombardier, (i * 37) % (pyxel.width - SuperBombardier.width), (i * 23) % (pyxel.height // 2))
+    frame = [0]
+
+    def update():
+        world.update(frame[0], game.planes)
+        bullets = game.enemy_bullets
+        bullets.update()
+        plane = game.plane
+        for i in bullets.hits(game.hitboxes.get((0, *plane.sprite())), plane.x, plane.y, game.hitboxes):
+            bullets.kill(i)
+        frame[0] += 1
+
+    def draw():
+        pyxel.cls(0)
+        world.draw()
+        game.enemy_bullets.draw()
+
+    return update, draw
+
+
+def bullet_storm(count=20):
+    # count planes firing rings of 32 bullets every 5 frames, thousands of bullets in the shared store
+    # They are super bombardiers with their own guns set in the world, a new enemy type would be added
+    # to the types every game knows
+    game = new_game()
+    world = game.world
+    world.clear()
+    for i in range(count):
+        plane = world.spawn(SuperBombardier, (i * 37) % (pyxel.width - 32), (i * 23) % (pyxel.height // 2))
+        world.pattern[plane] = PATTERNS["ring32"].id
+        world.shoot_speed[plane] = 5
+        world.points[plane] = 0
+    return game.tick, game.draw
+
+
+def formation_spawns(count=300):
+    # A new formation of count planes is laid out every frame, cycling through the shapes
+    game = new_game()
+    world = World(game.rng, game.enemy_bullets)
+    shapes = sorted(FORMATIONS)
+    frame = [0]
+
+    def update():
+        world.clear()
+        game.cluster.generate_cluster(world, RegularEnemy, shapes[frame[0] % len(shapes)], count)
+        frame[0] += 1
+
+    def draw():
+        pyxel.cls(0)
+        world.draw()
+
+    return update, draw
+
+
+def scripted_wave(count=1000):
+    # A wave script of count timed events, a few falling due every frame, the queue starts over when it runs out
+    # The enemies are cleared every frame, so only popping and spawning the events is timed
+    events = [{"enemy": "RegularEnemy", "x": (i * 37) % 232, "frame": 1 + i // 4} for i in range(count)]
+    game = GameManager(256, 256, headless=True, seed=0, level=Level.from_dict({"waves": [{"events": events}]}))
+    game.step(1, {pyxel.KEY_RETURN})
+    game.lives = 10 ** 9
+
+    def update():
+        if not game.schedule:
+            game.schedule_wave()
+        game.tick()
+        game.world.clear()
+
+    return update, game.draw
+
+
+def live_bullets(count=10000):
+    # count enemy bullets flying around at once, topped up every frame as they leave the screen
+    game = new_game()
+    rng = Random(1)
+    world = game.world
+    world.clear()
+    # The shooter flies up and away from the player so it lives through the whole benchmark
+    shooter = world.spawn(RegularEnemy, 0, pyxel.height / 2)
+    world.direction_y[shooter] = -1
+    world.direction_fixed[shooter] = True
+    directions = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]
+
+    def update():
+        bullets = game.enemy_bullets
+        for i in range(count - len(bullets)):
+            bullets.spawn(rng.uniform(0, pyxel.width - 6), rng.uniform(0, pyxel.height - 6), 69, 101, rng.choice(directions), 1)
+        game.tick()
+
+    return update, game.draw
+
+
+def blast_chain(per_frame=25):
+    # per_frame new blasts every frame, each living for several frames, like a chain of explosions
+    # The game is only made to set up the screen size in headless runs
+    new_game()
+    blasts = Explosions(BLAST_POOL_SIZE)
+    rng = Random(2)
+
+    def update():
+        for i in range(per_frame):
+            blasts.spawn(rng.uniform(0, pyxel.width), rng.uniform(0, pyxel.height))
+        blasts.update()
+
+    def draw():
+        pyxel.cls(0)
+        blasts.draw()
+
+    return update, draw
+
+
+def debris_5k(per_frame=400):
+    # per_frame new debris pieces every frame, about 5000 of them on screen once it settles
+    new_game()
+    debris = Debris(Random(3), DEBRIS_POOL_SIZE)
+    rng = Random(4)
+
+    def update():
+        for i in range(per_frame // 20):
+            debris.burst(rng.uniform(0, pyxel.width), rng.uniform(0, pyxel.height), 20, life=(8, 17))
+        debris.update()
+
+    def draw():
+        pyxel.cls(0)
+        debris.draw()
+
+    return update, draw
+
+
+SCENARIOS = {
+    "regular_formation_500": regular_formation,
+    "rewind_formation_500": rewind_formation,
+    "super_bombardier_20": super_bombardiers,
+    "formation_spawn_300": formation_spawns,
+    "scripted_wave_1000": scripted_wave,
+    "bullet_storm_20": bullet_storm,
+    "live_bullets_10k": live_bullets,
+    "blast_chain": blast_chain,
+    "debris_5k": debris_5k,
+}
+
+
+def run_frames(update_function, draw_function, frames, draw):
+    # Runs frames frames of a scenario, drawing them too when draw is set
+    for i in range(frames):
+        update_function()
+        if draw:
+            draw_function()
+
+
+def run_scenario(build, frames, draw, repeats=5, warmup=10):
+    # Times a scenario repeats times, each time built anew and run for warmup frames before the timed ones,
+    # then runs it once more under tracemalloc (which slows it down) for the memory figures
+    # The median frame of a run is far less noisy than the mean, and the fastest of the runs is kept
+    update_ms = draw_ms = float("inf")
+    for repeat in range(repeats):
+        update_function, draw_function = build()
+        run_frames(update_function, draw_function, warmup, draw)
+        update_times = []
+        draw_times = []
+        for i in range(frames):
+            start = perf_counter()
+            update_function()
+            middle = perf_counter()
+            if draw:
+                draw_function()
+            draw_times.append(perf_counter() - middle)
+            update_times.append(middle - start)
+        update_ms = min(update_ms, median(update_times) * 1000)
+        draw_ms = min(draw_ms, median(draw_times) * 1000)
+
+    # The memory figures are the same on every run, the warmup frames leave out the stores growing
+    # to their working size
+    update_function, draw_function = build()
+    run_frames(update_function, draw_function, warmup, draw)
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    # Memory allocated by each frame on top of what was allocated when it started, at its highest,
+    # which is the temporary arrays and objects the frame makes even when it frees them all again
+    # (kept in an array made beforehand, so storing them allocates no blocks)
+    frame_allocations = np.zeros(frames)
+    peak = 0
+    for i in range(frames):
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        update_function()
+        if draw:
+            draw_function()
+        frame_peak = tracemalloc.get_traced_memory()[1]
+        frame_allocations[i] = frame_peak - start
+        peak = max(peak, frame_peak)
+    blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+
+    return {
+        "update_ms": update_ms,
+        "draw_ms": draw_ms if draw else None,
+        "frame_allocation_kb": float(np.median(frame_allocations)) / 1024,
+        # Memory blocks still allocated after the run, per frame, anything above 0 means a frame keeps
+        # something (a leak or a growing store) and not how much it allocates
+        "retained_blocks_per_frame": blocks / frames,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+# Changes smaller than these are noise and never flagged, whatever the threshold
+NOISE_FLOOR = {
+    "update_ms": 0.1,
+    "draw_ms": 0.1,
+    "frame_allocation_kb": 4,
+    "retained_blocks_per_frame": 1,
+    "peak_memory_kb": 16,
+}
+
+
+# Metrics which are timings, the others are memory figures
+TIMINGS = ("update_ms", "draw_ms")
+
+
+def find_regressions(results, baseline, threshold, memory_threshold):
+    # Returns the (scenario, metric, value, baseline value) of every metric that got worse than the baseline
+    # by more than threshold for timings and memory_threshold for memory figures (0.5 = 50%)
+    # The baseline should come from a run with the same flags (drawing changes the timings)
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(name, {}).get(metric)
+            if value is None or reference is None:
+                continue
+            allowed = threshold if metric in TIMINGS else memory_threshold
+            if value > reference + max(abs(reference) * allowed, NOISE_FLOOR[metric]):
+                regressions.append((name, metric, value, reference))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress scenario benchmarks with regression baselines")
+    parser.add_argument("--frames", type=int, default=120, help="frames timed per run of a scenario")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per scenario, the fastest is kept")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed frames at the start of every run")
+    parser.add_argument("--only", choices=sorted(SCENARIOS), action="append", help="run only this scenario")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown before flagging (0.5 = 50%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.1, help="allowed memory growth before flagging")
+    parser.add_argument("--retries", type=int, default=2, help="times a scenario flagged as slower is run again")
+    parser.add_argument("--no-draw", action="store_true", help="don't time drawing (no display needed)")
+    args = parser.parse_args()
+
+    draw = not args.no_draw
+    if draw:
+        pyxel.init(256, 256, title="Galaxy King benchmark")
+        pyxel.load(os.path.join(HERE, "Assets", "asset.pyxres"))
+
+    results = {}
+    for name in args.only or SCENARIOS:
+        results[name] = run_scenario(SCENARIOS[name], args.frames, draw, args.repeats, args.warmup)
+        print(name, json.dumps(results[name]))
+
+    # The baseline remembers how it was run, the memory figures depend on the number of frames
+    settings = {"frames": args.frames, "repeats": args.repeats, "warmup": args.warmup, "draw": draw}
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump({"settings": settings, **results}, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("settings") != settings:
+            print("Warning: the baseline was run with", baseline.get("settings"), "and this run with", settings)
+        regressions = find_regressions(results, baseline, args.threshold, args.memory_threshold)
+        # A slow spell of the machine can make a whole scenario slower, so the scenarios flagged
+        # for their timings are run again and keep their fastest timings before being reported
+        for retry in range(args.retries):
+            slower = sorted({name for name, metric, value, reference in regressions if metric in TIMINGS})
+            if not slower:
+                break
+            for name in slower:
+                again = run_scenario(SCENARIOS[name], args.frames, draw, args.repeats, args.warmup)
+                for metric in TIMINGS:
+                    if results[name][metric] is not None:
+                        results[name][metric] = min(results[name][metric], again[metric])
+                print(name, "again", json.dumps(results[name]))
+            regressions = find_regressions(results, baseline, args.threshold, args.memory_threshold)
+        for name, metric, value, reference in regressions:
+            print("REGRESSION", f"{name} {metric}: {value:.3f} (baseline {reference:.3f})")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against", args.baseline)
+    else:
+        print(f"No baseline at {args.baseline}, run with --save to create one")
@@ -0,0 +1,183 @@
+import numpy as np
+import pyxel
+from collision import overlaps_rect_many, masks_overlap
+
+# This file holds the bullet store which replaced the one object per bullet approach
+# Every bullet of an owner lives in a few flat numpy arrays (one for x, one for y and so on)
+# so moving, culling and removing bullets is a handful of array operations per frame
+# no matter how many bullets there are
+# The arrays are allocated once up front and reused, so firing never allocates unless the store is full
+
+# Every bullet shares the same sprite size, and the player's bullet is the sprite at PLAYER_BULLET_U, PLAYER_BULLET_V
+BULLET_WIDTH = 6
+BULLET_HEIGHT = 6
+PLAYER_BULLET_U = 69
+PLAYER_BULLET_V = 85
+
+
+class BulletStore:
+    # Struct of arrays holding bullets, slot i of every array belongs to the same bullet
+    def __init__(self, capacity=64):
+        # Number of bullets currently in the store, they always sit in slots 0 to count - 1
+        self.count = 0
+
+        # Every bullet shares the same sprite size and damage
+        self.width = BULLET_WIDTH
+        self.height = BULLET_HEIGHT
+        self.damage = 10
+
+        # Position, velocity (direction multiplied by speed) and sprite coordinates
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.vx = np.zeros(capacity, dtype=np.float64)
+        self.vy = np.zeros(capacity, dtype=np.float64)
+        self.u = np.zeros(capacity, dtype=np.int16)
+        self.v = np.zeros(capacity, dtype=np.int16)
+        # Bullets which hit something are marked dead here and removed on the next update
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        # Statistics used to tune the pool sizes in config.py
+        # most bullets alive at once and how many times the arrays had to grow
+        self.high_water_mark = 0
+        self.grow_count = 0
+        # Bullets fired over the whole game
+        self.fired = 0
+
+    def __len__(self):
+        return self.count
+
+    def arrays(self):
+        # All the per bullet arrays, in the order they are declared
+        return [self.x, self.y, self.vx, self.vy, self.u, self.v, self.alive]
+
+    def reserve(self, extra):
+        # Makes sure there is room for extra more bullets, doubling the arrays when they are full
+        needed = self.count + extra
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.grow_count += 1
+        self.x, self.y, self.vx, self.vy, self.u, self.v, self.alive = [
+            np.concatenate((array, np.zeros(capacity - len(array), dtype=array.dtype))) for array in self.arrays()
+        ]
+
+    def spawn(self, x, y, u=PLAYER_BULLET_U, v=PLAYER_BULLET_V, direction=(0, -1), speed=10):
+        # Fires a single bullet, the defaults are the player's bullet going upwards
+        # Note: directions work like unit vectors, (-1, 0) meaning left, (1, 0) right, etc
+        self.reserve(1)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = direction[0] * speed
+        self.vy[i] = direction[1] * speed
+        self.u[i] = u
+        self.v[i] = v
+        self.alive[i] = True
+        self.count += 1
+        self.fired += 1
+        self.high_water_mark = max(self.high_water_mark, self.count)
+
+    def spawn_many(self, x, y, u, v, directions, speed):
+        # Fires one bullet per direction in a single batch, x, y and speed can be numbers or arrays
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 2)
+        n = len(directions)
+        self.reserve(n)
+        start = self.count
+        end = start + n
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end] = directions[:, 0] * speed
+        self.vy[start:end] = directions[:, 1] * speed
+        self.u[start:end] = u
+        self.v[start:end] = v
+        self.alive[start:end] = True
+        self.count = end
+        self.fired += n
+        self.high_water_mark = max(self.high_water_mark, self.count)
+
+    def stats(self):
+        # Returns the pool statistics as a dictionary
+        return {
+            "capacity": len(self.x),
+            "in_use": self.count,
+            "high_water_mark": self.high_water_mark,
+            "grow_count": self.grow_count,
+            "fired": self.fired,
+        }
+
+    def kill(self, i):
+        # Marks a bullet as dead, it stops being drawn and colliding straight away
+        self.alive[i] = False
+
+    def clear(self):
+        # Removes every bullet
+        self.count = 0
+
+    def update(self):
+        # Moves every bullet, kills the ones outside the screen and removes all dead bullets
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        x += self.vx[:n]
+        y += self.vy[:n]
+
+        self.alive[:n] &= (
+            (y >= 0)
+            & (y <= pyxel.height - self.height)
+            & (x >= 0)
+            & (x <= pyxel.width - self.width)
+        )
+        self.compact()
+
+    def compact(self):
+        # Packs the living bullets into the front of the arrays, keeping their order
+        n = self.count
+        keep = np.flatnonzero(self.alive[:n])
+        m = len(keep)
+        if m == n:
+            return
+        for array in self.arrays():
+            array[:m] = array[keep]
+        self.count = m
+
+    def alive_indices(self):
+        # Slots of the bullets that are still alive
+        return np.flatnonzero(self.alive[:self.count])
+
+    def hits(self, hitbox, x, y, hitboxes):
+        # Returns the slots of living bullets touching a sprite drawn at x, y whose hitbox is given
+        # The tight boxes of the bullets are tested at once, then the bullets left over pixel by pixel
+        n = self.count
+        if n == 0:
+            return []
+        # Every bullet sprite fits in the same box, so it is tested first with one set of numbers for all
+        left, top, width, height = hitboxes.shared_box(0, self.width, self.height)
+        mask = overlaps_rect_many(
+            self.x[:n] + left, self.y[:n] + top, width, height,
+            x + hitbox.left, y + hitbox.top, hitbox.width, hitbox.height,
+        )
+        return [
+            i for i in np.flatnonzero(mask & self.alive[:n]).tolist()
+            if masks_overlap(hitbox, x, y, self.hitbox(i, hitboxes), self.x[i], self.y[i])
+        ]
+
+    def hitbox(self, i, hitboxes):
+        # Returns the hitbox of the sprite of bullet i
+        return hitboxes.get((0, int(self.u[i]), int(self.v[i]), self.width, self.height))
+
+    def hitboxes(self, slots, hitboxes):
+        # Returns the x, y, width and height arrays of the tight boxes of the given bullets,
+        # on the whole pixels the bullets are drawn at
+        edges = np.array([(box.left, box.top, box.width, box.height) for box in
+                          (self.hitbox(i, hitboxes) for i in slots)], dtype=np.float64).reshape(-1, 4)
+        return np.floor(self.x[slots]) + edges[:, 0], np.floor(self.y[slots]) + edges[:, 1], edges[:, 2], edges[:, 3]
+
+    def draw(self):
+        # Draws every living bullet, pyxel can only draw one sprite per call
+        i = self.alive_indices()
+        for x, y, u, v in zip(self.x[i].tolist(), self.y[i].tolist(), self.u[i].tolist(), self.v[i].tolist()):
+            pyxel.blt(x, y, 0, u, v, self.width, self.height, 0)
@@ -1,97 +1,188 @@
 import pyxel
-from random import randint
+from math import isqrt
 
 # This is the class to handle cluster formations of the enemy planes(regular and red)
-# The first plane in the list is the leader of the formation
-# The leader is the only plane that can move, the rest of the planes follow the leader
+# The first plane of a formation is its leader
+# The leader is the only plane that can move, the rest of the planes follow the leader at a fixed offset
+# and when the leader is destroyed one of them takes its place
+# The planes themselves live in the World (world.py), this class decides where they start
+#
+# Formations are laid out on a grid of plane sized cells, cell (0, 0) being the leader's
+# An occupancy bitmap remembers which cells are taken so planes are never stacked on top of each other,
+# checking a cell is a single lookup so even formations of hundreds of planes are placed in O(n)
+
+# Neighbouring cells, the directions a random walk can take
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]
+
+
+class OccupancyGrid:
+    # Bitmap of the cells of a formation, one byte per cell
+    # It covers columns left to right and rows top to bottom (inclusive), cell (0, 0) being the leader's
+    def __init__(self, left, right, top, bottom):
+        self.left = left
+        self.top = top
+        self.columns = right - left + 1
+        self.rows = bottom - top + 1
+        self.bits = bytearray(self.columns * self.rows)
+
+    def index(self, col, row):
+        # Position of a cell in the bitmap, None for cells outside the grid
+        col -= self.left
+        row -= self.top
+        if 0 <= col < self.columns and 0 <= row < self.rows:
+            return row * self.columns + col
+        return None
+
+    def free(self, col, row):
+        # Whether a plane can be put in the cell
+        i = self.index(col, row)
+        return i is not None and not self.bits[i]
+
+    def take(self, col, row):
+        # Marks the cell as taken, returns False if it already was (or is outside the grid)
+        i = self.index(col, row)
+        if i is None or self.bits[i]:
+            return False
+        self.bits[i] = 1
+        return True
+
+
+# Shapes, each one returns the cells of count planes, the leader's first
+# Every shape comes with the bounds (left, right, top, bottom) of the grid it needs for count planes
+
+def line_cells(count, grid, rng):
+    # A row of planes side by side, the leader in the middle
+    cells = []
+    for i in range(count):
+        # 0, 1, -1, 2, -2, ...
+        col = (i + 1) // 2 if i % 2 else -(i // 2)
+        if grid.take(col, 0):
+            cells.append((col, 0))
+    return cells
+
+
+def v_cells(count, grid, rng):
+    # A V pointing down at the player, the leader at its tip and the two arms trailing behind it
+    cells = []
+    for i in range(count):
+        step = (i + 1) // 2
+        cell = (step if i % 2 else -step, -step)
+        if grid.take(*cell):
+            cells.append(cell)
+    return cells
+
+
+def diamond_cells(count, grid, rng):
+    # Rings of planes around the leader, each ring one cell further out (a diamond, as the distance is
+    # counted in whole columns plus rows)
+    cells = []
+    distance = 0
+    while len(cells) < count:
+        for col in range(-distance, distance + 1):
+            rest = distance - abs(col)
+            for row in sorted({rest, -rest}):
+                if len(cells) < count and grid.take(col, row):
+                    cells.append((col, row))
+        distance += 1
+    return cells
+
+
+def grid_cells(count, grid, rng):
+    # Rows and columns of planes, about as wide as they are tall, the leader in the top left corner
+    columns = max(1, isqrt(count - 1) + 1)
+    cells = []
+    for i in range(count):
+        cell = (i % columns, i // columns)
+        if grid.take(*cell):
+            cells.append(cell)
+    return cells
+
+
+def random_walk_cells(count, grid, rng):
+    # Every plane is put next to the previous one in a random direction
+    # When every neighbour is taken the walk carries on from an earlier plane which still has a free one
+    # Planes whose neighbours are all taken are dropped from the open list, so each one is only given up once
+    grid.take(0, 0)
+    cells = [(0, 0)]
+    open_cells = [(0, 0)]
+    # Index in open_cells of the plane the walk is at
+    current = 0
+    while len(cells) < count and open_cells:
+        col, row = open_cells[current]
+        direction = DIRECTIONS[rng.randint(0, len(DIRECTIONS) - 1)]
+        cell = (col + direction[0], row + direction[1])
+        if not grid.free(*cell):
+            # Tries the other directions in order before looking for another plane to walk from
+            cell = None
+            for step_col, step_row in DIRECTIONS:
+                if grid.free(col + step_col, row + step_row):
+                    cell = (col + step_col, row + step_row)
+                    break
+            if cell is None:
+                # Swapped with the last open plane and popped, which is O(1)
+                open_cells[current] = open_cells[-1]
+                open_cells.pop()
+                if open_cells:
+                    current = rng.randint(0, len(open_cells) - 1)
+                continue
+        grid.take(*cell)
+        cells.append(cell)
+        open_cells.append(cell)
+        current = len(open_cells) - 1
+    return cells
+
+
+# Formation shapes by name, with the bounds of the grid they need for count planes
+FORMATIONS = {
+    "line": (line_cells, lambda count: (-(count // 2), count // 2, 0, 0)),
+    "v": (v_cells, lambda count: (-(count // 2), count // 2, -(count // 2), 0)),
+    "diamond": (diamond_cells, lambda count: (-isqrt(count) - 1, isqrt(count) + 1, -isqrt(count) - 1, isqrt(count) + 1)),
+    "grid": (grid_cells, lambda count: (0, isqrt(count - 1), 0, isqrt(count - 1) + 1)),
+    # The walk is kept in a square of about four times as many cells as planes, so it stays bunched up
+    "random_walk": (random_walk_cells, lambda count: (-isqrt(count) - 1, isqrt(count) + 1, -isqrt(count) - 1, isqrt(count) + 1)),
+}
 
 
 class ClusterHandler:
     # Creates cluster formations
-    def __init__(self):
-        self.directions = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]
-        # The cluster formation is a list of lists, each list is a plane in the formation
+    def __init__(self, rng):
+        # Random number generator of the game, so the formations can be replayed from the seed
+        self.rng = rng
+
+        self.directions = DIRECTIONS
         self.cluster_w = 24
         self.cluster_h = 24
 
         # Generate random x,y coordinates 
-        self.cluster_x = randint(0, int(pyxel.width / 2) - self.cluster_w)
-        self.cluster_y = randint(0, int(pyxel.height / 2) - self.cluster_h)
+        self.cluster_x = self.rng.randint(0, int(pyxel.width / 2) - self.cluster_w)
+        self.cluster_y = self.rng.randint(0, int(pyxel.height / 2) - self.cluster_h)
 
         # Determines the cluster size
-        self.cluster_size = randint(2, 7)
-        self.cluster_list = []
-
-    def generate_cluster(self, Enemy):
-        # This is where the cluster formation takes place,
-        # it assigns random neighbouring locations relative to the previous coordinates
-        # Can create a duplicate and modified method for specific formations
-        previous = 0
-        for i in range(self.cluster_size):
-            # Randomly select a direction from the list
-            # The direction is relative to the previous plane in the formation
-            if previous == 0:
-                # If there is no previous plane, select a random direction as this plane is the leader
-                previous = [self.cluster_x, self.cluster_y]
-                enemy = Enemy()
-                enemy.x, enemy.y = previous
-                self.cluster_list.append(enemy)
-            else:
-                # Select a random direction from the list
-                direction = self.directions[randint(0, len(self.directions) - 1)]
-                # Add the direction to the previous plane's coordinates
-                cluster_x = (direction[0] * previous[0]) + self.cluster_w
-                cluster_y = (direction[1] * previous[1]) + self.cluster_h
-                # Create a new plane and add it to the formation
-                previous = [cluster_x, cluster_y]
-
-                previous = [max(cluster_x, 0), max(cluster_y, 0)]
-                previous = [min(previous[0], pyxel.width - self.cluster_w), min(previous[1], (pyxel.height / 2) - self.cluster_h)]
-                #
-                if previous not in self.cluster_list:
-                    enemy = Enemy()
-                    enemy.x, enemy.y = previous
-                    self.cluster_list.append(enemy)
-
-    # Filter update calls based on wave and enemy type compatibility
-    def update(self, wave):
-        # Updates the cluster formation based on the wave we are on
-        for object in self.cluster_list:
-            # This is for the regular enemy plane cluster formation, that moves in a random direction
-            if wave == 0 and object.name == "RegularEnemy":
-                if object.alive:
-                    object.update()
-                else:
-                    # If plane is dead, remove it from the list
-                    self.cluster_list.remove(object)
-            #
-            elif wave == 1 and object.name == "RedEnemy":
-                # This is for the red enemy plane cluster formation,  that moves in a random direction(in circles)
-                if object.alive:
-                    object.update()
-                else:
-                    # If plane is dead, remove it from the list
-                    self.cluster_list.remove(object)
-
-    def draw(self, wave):
-        # Filter draw calls based on wave and enemy type compatibility
-        # Draws planes in the cluster formation based on the wave we are on
-        # There are two waves, wave 0 is for the regular enemy plane cluster formation
-        # wave 1 is for the red enemy plane cluster formation
-        # There are other waves, but they are for the bombardier and super bombardier planes
-        # These planes are not in a cluster formation, as such we do not implement them here
-        for object in self.cluster_list:
-            if wave == 0 and object.name == "RegularEnemy":
-                if object.alive:
-                    # Draws the regular enemies if they are alive
-                    object.draw()
-            elif wave == 1 and object.name == "RedEnemy":
-                if object.alive:
-                    # Draws the red enemies if they are alive
-                    object.draw()
-
-# Testing
-# currently useless
-if __name__ == "__main__":
-    cluster_handler = ClusterHandler()
-    cluster_handler.generate_cluster()
+        self.cluster_size = self.rng.randint(2, 7)
+
+    def generate_cluster(self, world, enemy_type, shape="random_walk", size=None):
+        # Lays out a formation (see layout()) and spawns it in the world as a leader and its followers
+        # Returns the number of the formation
+        x, y, offsets = self.layout(enemy_type, shape, size)
+        return world.spawn_formation(enemy_type, x, y, offsets)
+
+    def layout(self, enemy_type, shape="random_walk", size=None):
+        # This is where the cluster formation takes place, the planes are laid out in the given shape
+        # (a name from FORMATIONS) one plane size apart
+        # size is the number of planes, the cluster's own random size by default
+        # Returns the leader's coordinates and the offsets of the followers from it
+        size = size or self.cluster_size
+        cells_of, bounds = FORMATIONS[shape]
+        cells = cells_of(size, OccupancyGrid(*bounds(size)), self.rng)
+
+        offsets = [(col * enemy_type.width, row * enemy_type.height) for col, row in cells[1:]]
+
+        # The formation is moved so it starts inside the top half of the screen when it fits,
+        # as close as possible to the cluster's coordinates
+        left = min([0] + [x for x, y in offsets])
+        right = max([0] + [x for x, y in offsets])
+        top = min([0] + [y for x, y in offsets])
+        bottom = max([0] + [y for x, y in offsets])
+        x = max(-left, min(self.cluster_x, pyxel.width - enemy_type.width - right))
+        y = max(-top, min(self.cluster_y, (pyxel.height / 2) - enemy_type.height - bottom))
+        return x, y, offsets
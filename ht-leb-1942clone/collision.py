@@ -0,0 +1,153 @@
+import math
+import numpy as np
+
+# This file handles collision detection between the game objects
+# Instead of checking every bullet against every plane, objects are sorted into a grid of square cells
+# (a spatial hash) and only objects sharing a cell with each other are actually compared
+# The grid holds rectangles given as arrays and answers with their indices, for many rectangles at once
+#
+# The rectangles tested are the tight boxes of the sprites' solid pixels (see hitboxes.py), and a pair whose
+# boxes overlap only collides if masks_overlap() finds a solid pixel of one on top of a solid pixel of the other
+
+
+def overlaps_rect_many(xs, ys, widths, heights, x, y, width, height):
+    # Checks which rectangles of numpy arrays overlap a rectangle (axis aligned bounding box test)
+    # Returns a boolean array which is True where a rectangle overlaps it
+    # x, y, width and height can be arrays too, rectangle i of the arrays is then tested against rectangle i
+    return (
+        (xs + widths > x)
+        & (x + width > xs)
+        & (ys + heights > y)
+        & (y + height > ys)
+    )
+
+
+def masks_overlap(a, ax, ay, b, bx, by):
+    # Checks if the solid pixels of two sprites touch, a and b are their hitboxes and ax, ay and bx, by
+    # the positions the sprites are drawn at (the top left corners of the whole sprites)
+    # Positions are rounded down to whole pixels, the boxes overlapping with fractions of a pixel
+    # but not once rounded is only a near miss
+    ax = math.floor(ax) + a.left
+    ay = math.floor(ay) + a.top
+    bx = math.floor(bx) + b.left
+    by = math.floor(by) + b.top
+    if ax + a.width <= bx or bx + b.width <= ax or ay + a.height <= by or by + b.height <= ay:
+        return False
+    # Where the part the two boxes share lies inside the solid cores of both, the pixels touch for sure
+    # and the masks aren't needed
+    left = max(ax, bx)
+    top = max(ay, by)
+    right = min(ax + a.width, bx + b.width)
+    bottom = min(ay + a.height, by + b.height)
+    if inside_core(a, ax, ay, left, top, right, bottom) and inside_core(b, bx, by, left, top, right, bottom):
+        return True
+    # The rows of both masks are shifted to line up their pixels, then the rows the two boxes share are compared
+    shift_a = max(0, ax - bx)
+    shift_b = max(0, bx - ax)
+    a_rows = a.rows
+    b_rows = b.rows
+    dy = ay - by
+    for row in range(max(0, -dy), min(a.height, b.height - dy)):
+        if (a_rows[row] << shift_a) & (b_rows[row + dy] << shift_b):
+            return True
+    return False
+
+
+def inside_core(box, x, y, left, top, right, bottom):
+    # Checks if a rectangle (given by its edges) lies inside the solid core of a hitbox whose tight box is at x, y
+    core_left, core_top, core_width, core_height = box.core
+    core_left += x - box.left
+    core_top += y - box.top
+    return (left >= core_left and top >= core_top
+            and right <= core_left + core_width and bottom <= core_top + core_height)
+
+
+class SpatialHash:
+    # Uniform grid which buckets rectangles by the cells they cover
+    # The rectangles are given as arrays (e.g. the planes of the World) and the grid stores their indices
+    # The grid is a sorted array of cell numbers, one entry per cell a rectangle covers, so building it
+    # and looking up the cells of many rectangles at once are a few numpy operations instead of a loop
+    # No rectangle may be bigger than a cell, so each one covers at most 2 x 2 cells
+    def __init__(self, cell_size=32):
+        # Size of one square cell in pixels, at least the size of the biggest sprite
+        self.cell_size = cell_size
+        # Cell number of every entry, in increasing order, and the index of the rectangle of the entry
+        self.cells = np.zeros(0, dtype=np.int64)
+        self.owners = np.zeros(0, dtype=np.intp)
+        # Left, right, top and bottom edges of the rectangles the grid was built from, a row each
+        self.edges = np.zeros((4, 0))
+
+    def covered_cells(self, edges):
+        # Returns the numbers of the cells covered by the rectangles with the given edges (see self.edges)
+        # and the index of the rectangle of each, a rectangle covering fewer than 4 cells repeats some of them
+        # A cell number is its row times 2 ** 32 plus its column, unique for cells off the screen too
+        count = len(edges[0])
+        index = (edges // self.cell_size).astype(np.int64)
+        index[2:] <<= 32
+        # Top left, top right, bottom left and bottom right corners
+        cells = (index[2:, None] + index[None, :2]).ravel()
+        return cells, np.arange(4 * count) % count
+
+    def build(self, xs, ys, widths, heights):
+        # Rebuilds the grid from scratch with the given rectangles (numpy arrays of the same length),
+        # done every frame since everything moves
+        if len(xs) and max(widths.max(), heights.max()) > self.cell_size:
+            raise ValueError(f"rectangles can't be bigger than the {self.cell_size} pixel cells of the grid")
+        self.edges = np.array((xs, xs + widths, ys, ys + heights))
+        cells, owners = self.covered_cells(self.edges)
+        order = np.argsort(cells)
+        self.cells = cells[order]
+        self.owners = owners[order]
+
+    def pairs(self, xs, ys, widths, heights):
+        # Finds every pair of one of the given rectangles (numpy arrays, each fitting in a cell)
+        # and a rectangle of the grid which overlap
+        # Only rectangles of the grid in the cells a given rectangle touches are tested, each of them once
+        # Returns the index of the given rectangle and the index in the grid of every pair,
+        # in order of the given rectangles then of the grid
+        none = np.zeros(0, dtype=np.intp)
+        if len(self.cells) == 0 or len(xs) == 0:
+            return none, none
+        edges = np.array((xs, xs + widths, ys, ys + heights))
+        cells, queries = self.covered_cells(edges)
+        # The entries of a cell are next to each other in the grid, from start to start + counts
+        start = np.searchsorted(self.cells, cells)
+        counts = np.searchsorted(self.cells, cells, "right") - start
+        most = counts.max()
+        if most == 0:
+            return none, none
+        position = np.arange(most)
+        found = position < counts[:, None]
+        # Rectangles sharing several cells are found once per cell, every pair is only kept once
+        count = len(self.edges[0])
+        pairs = np.unique(queries.repeat(counts) * count + self.owners[(start[:, None] + position)[found]])
+        queries, others = np.divmod(pairs, count)
+        # Sharing a cell doesn't mean overlapping, the rectangles of the pairs are tested all at once
+        a = edges[:, queries]
+        b = self.edges[:, others]
+        hit = (a[1] > b[0]) & (b[1] > a[0]) & (a[3] > b[2]) & (b[3] > a[2])
+        return queries[hit], others[hit]
+
+    def query_rect(self, x, y, width, height):
+        # Returns the index of every rectangle in the grid that overlaps the given rectangle, in increasing order
+        # Same as pairs() for a single rectangle, which is quicker one by one than with arrays
+        if width > self.cell_size or height > self.cell_size:
+            raise ValueError(f"rectangles can't be bigger than the {self.cell_size} pixel cells of the grid")
+        size = self.cell_size
+        left = int(x // size)
+        right = int((x + width) // size)
+        top = int(y // size) << 32
+        bottom = int((y + height) // size) << 32
+        cells = [top + left, top + right, bottom + left, bottom + right]
+        starts = self.cells.searchsorted(cells).tolist()
+        ends = self.cells.searchsorted(cells, "right").tolist()
+        # A rectangle covering several of the cells is only tested once
+        seen = set()
+        for start, end in zip(starts, ends):
+            seen.update(self.owners[start:end].tolist())
+        left_edges, right_edges, top_edges, bottom_edges = self.edges
+        return [
+            other for other in sorted(seen)
+            if x + width > left_edges[other] and right_edges[other] > x
+            and y + height > top_edges[other] and bottom_edges[other] > y
+        ]
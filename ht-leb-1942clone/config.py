@@ -0,0 +1,39 @@
+# This file holds the tuning values shared by several parts of the game
+# Change them here instead of hunting for them through the classes
+
+# Number of slots the bullet stores start with (they still grow if a fight needs more)
+PLAYER_BULLET_POOL_SIZE = 16
+# Every enemy plane fires into the same store, so it is sized for a whole wave
+ENEMY_BULLET_POOL_SIZE = 256
+
+# Number of slots the explosion store starts with (it grows if more explosions are on screen at once)
+BLAST_POOL_SIZE = 32
+# Same for the debris pieces, and how many pieces a destroyed plane breaks into
+DEBRIS_POOL_SIZE = 256
+DEBRIS_PER_KILL = 12
+
+# Number of stars in the background and the number of parallax layers they are spread over
+STAR_COUNT = 100
+STAR_LAYERS = 4
+
+# Game updates per second (the game was made for pyxel's default of 30)
+SIM_FPS = 30
+# Most updates run to catch up before a frame is drawn
+MAX_CATCH_UP_STEPS = 5
+
+# Number of planes of the next wave built ahead of time on every frame, so the wave change itself costs
+# no more than an ordinary frame (a fixed number rather than a time budget, so games still replay exactly)
+WAVE_PREFETCH_PLANES = 8
+
+# Number of frames the rewind buffer keeps (5 seconds) and how often it saves a whole snapshot
+# instead of only what changed since the frame before
+REWIND_FRAMES = 5 * SIM_FPS
+REWIND_KEYFRAME_INTERVAL = SIM_FPS
+
+# Game updates per second of the co-op server and the number of updates between two snapshots sent to
+# the clients (every other update, so 15 snapshots a second)
+SERVER_TICK_RATE = SIM_FPS
+SERVER_SNAPSHOT_INTERVAL = 2
+
+# Number of frames the profiler keeps the timings of (per stage)
+PROFILER_FRAMES = 600
@@ -0,0 +1,41 @@
+import pyxel
+
+# This file holds the input sources the game can be driven by
+# The keyboard one just forwards to pyxel, the scripted one is fed keys by hand
+# which lets the game run without a window (headless) where pyxel.btn can't be called
+
+
+class KeyboardControls:
+    # Reads the real keyboard through pyxel, used when the game runs in a window
+    def btn(self, key):
+        # True while the key is held down
+        return pyxel.btn(key)
+
+    def btnp(self, key):
+        # True only on the frame the key was pressed
+        return pyxel.btnp(key)
+
+    def next_frame(self, keys=()):
+        # Pyxel tracks the keyboard itself, so there is nothing to do here
+        pass
+
+
+class ScriptedControls:
+    # Input source which is told which keys are held on each frame instead of reading the keyboard
+    def __init__(self):
+        # Keys held on the current frame and the frame before it (needed to find fresh presses)
+        self.held = frozenset()
+        self.previous = frozenset()
+
+    def btn(self, key):
+        # True while the key is held down
+        return key in self.held
+
+    def btnp(self, key):
+        # True only on the first frame the key is held, same as pyxel.btnp without repeat
+        return key in self.held and key not in self.previous
+
+    def next_frame(self, keys=()):
+        # Moves on to the next frame with the given keys held
+        self.previous = self.held
+        self.held = frozenset(keys)
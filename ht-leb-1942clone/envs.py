@@ -0,0 +1,239 @@
+import argparse
+import json
+from time import perf_counter
+import numpy as np
+import pyxel
+from game_manager import GameManager
+
+# This file wraps headless games as training environments for pilot agents, with a gym style API:
+# reset() starts every game and returns the first observations, step(actions) plays one step of every game
+# and returns the observations, rewards, which games ended and some information about them
+# VectorEnv runs K independent games in one process, the observations and rewards of all of them come
+# back as NumPy arrays with one row per game, ready to be fed to a model in one batch
+#
+# A step plays frame_skip frames with the keys of the chosen action held down
+# Firing and flipping react to presses, so those keys are only held on the first frame of the step,
+# which lets an agent fire on every step without having to let go of the key in between
+
+# Actions, the keys held for each: the 9 ways to move (or not), each without and with firing,
+# then a flip
+MOVES = [
+    (),
+    (pyxel.KEY_LEFT,),
+    (pyxel.KEY_RIGHT,),
+    (pyxel.KEY_UP,),
+    (pyxel.KEY_DOWN,),
+    (pyxel.KEY_LEFT, pyxel.KEY_UP),
+    (pyxel.KEY_RIGHT, pyxel.KEY_UP),
+    (pyxel.KEY_LEFT, pyxel.KEY_DOWN),
+    (pyxel.KEY_RIGHT, pyxel.KEY_DOWN),
+]
+ACTIONS = [frozenset(move) for move in MOVES] + [frozenset(move + (pyxel.KEY_X,)) for move in MOVES] + [frozenset({pyxel.KEY_Z})]
+# Keys which only count when pressed, held on the first frame of a step only
+TAPPED_KEYS = frozenset({pyxel.KEY_X, pyxel.KEY_Z})
+
+# Numbers describing the player's plane at the start of an object observation
+PLANE_FEATURES = 8
+# Numbers describing each enemy plane and enemy bullet: offset from the player (x, y), size or velocity
+# (x, y) and whether the slot holds anything
+OBJECT_FEATURES = 5
+
+
+class VectorEnv:
+    # count independent games played side by side
+    # observation is "objects" for a vector of positions, or "frame" for a downsampled picture of the screen
+    def __init__(self, count, seed=0, observation="objects", frame_skip=2, max_steps=5000,
+                 max_enemies=16, max_bullets=32, frame_size=64, score_scale=0.1, life_penalty=1.0):
+        if observation not in ("objects", "frame"):
+            raise ValueError(f"unknown observation {observation!r}")
+        self.count = count
+        self.observation = observation
+        self.frame_skip = frame_skip
+        # Steps after which a game is stopped even if the player is still alive
+        self.max_steps = max_steps
+        # Closest enemies and bullets described in an object observation
+        self.max_enemies = max_enemies
+        self.max_bullets = max_bullets
+        # Width and height of a frame observation
+        self.frame_size = frame_size
+        # The reward of a step is the score gained times score_scale, minus life_penalty for every life lost
+        self.score_scale = score_scale
+        self.life_penalty = life_penalty
+
+        # Seed of the next game started, every game gets a new one so no two games are the same
+        self.next_seed = seed
+        self.games = [None] * count
+        self.steps = np.zeros(count, dtype=np.int64)
+        self.last_score = np.zeros(count, dtype=np.int64)
+        self.last_lives_lost = np.zeros(count, dtype=np.int64)
+
+        if observation == "objects":
+            self.observation_shape = (PLANE_FEATURES + OBJECT_FEATURES * (max_enemies + max_bullets),)
+        else:
+            self.observation_shape = (3, frame_size, frame_size)
+        self.action_count = len(ACTIONS)
+
+    def start_game(self, i):
+        # Starts a new game in slot i, past the title screen
+        game = GameManager(256, 256, headless=True, seed=self.next_seed, profile=False)
+        self.next_seed += 1
+        game.step(1, {pyxel.KEY_RETURN})
+        self.games[i] = game
+        self.steps[i] = 0
+        self.last_score[i] = game.score
+        self.last_lives_lost[i] = game.lives_lost
+
+    def reset(self):
+        # Starts every game over and returns their first observations
+        for i in range(self.count):
+            self.start_game(i)
+        return self.observe()
+
+    def step(self, actions):
+        # Plays one step of every game, actions holds the index in ACTIONS of each game's action
+        # Returns the observations, rewards, done flags and a list of information dictionaries
+        # A game which ends is started over straight away, its observation is the new game's first one
+        # and its final score and length are in its information dictionary
+        rewards = np.zeros(self.count, dtype=np.float32)
+        dones = np.zeros(self.count, dtype=bool)
+        infos = [{} for i in range(self.count)]
+        for i, action in enumerate(np.asarray(actions).tolist()):
+            game = self.games[i]
+            keys = ACTIONS[action]
+            held = keys - TAPPED_KEYS
+            game.tick(keys)
+            for frame in range(self.frame_skip - 1):
+                game.tick(held)
+            self.steps[i] += 1
+
+            rewards[i] = (self.score_scale * (game.score - self.last_score[i])
+                          - self.life_penalty * (game.lives_lost - self.last_lives_lost[i]))
+            self.last_score[i] = game.score
+            self.last_lives_lost[i] = game.lives_lost
+
+            if game.scene != "PLAY" or self.steps[i] >= self.max_steps:
+                dones[i] = True
+                infos[i] = {
+                    "score": game.score,
+                    "steps": int(self.steps[i]),
+                    "result": game.scene,
+                    "truncated": game.scene == "PLAY",
+                }
+                self.start_game(i)
+        return self.observe(), rewards, dones, infos
+
+    def observe(self):
+        # Observations of every game, one row each
+        observations = np.zeros((self.count,) + self.observation_shape, dtype=np.float32)
+        for i, game in enumerate(self.games):
+            if self.observation == "objects":
+                self.observe_objects(game, observations[i])
+            else:
+                self.observe_frame(game, observations[i])
+        return observations
+
+    def observe_objects(self, game, out):
+        # Fills out with the player's plane followed by the closest enemies and enemy bullets,
+        # closest first, positions relative to the middle of the plane and divided by the screen size
+        width = pyxel.width
+        height = pyxel.height
+        plane = game.plane
+        centre_x = plane.x + plane.width / 2
+        centre_y = plane.y + plane.height / 2
+        out[:PLANE_FEATURES] = (
+            plane.x / width, plane.y / height, plane.vx / plane.speed, plane.vy / plane.speed,
+            plane.flipping, plane.flips / plane.total_flips, game.lives / game.total_lives, plane.double_bullet,
+        )
+
+        world = game.world
+        n = len(world)
+        start = PLANE_FEATURES
+        self.closest(
+            out[start:start + OBJECT_FEATURES * self.max_enemies].reshape(self.max_enemies, OBJECT_FEATURES),
+            (world.x[:n] + world.width[:n] / 2 - centre_x) / width,
+            (world.y[:n] + world.height[:n] / 2 - centre_y) / height,
+            world.width[:n] / width,
+            world.height[:n] / height,
+        )
+
+        bullets = game.enemy_bullets
+        n = len(bullets)
+        start += OBJECT_FEATURES * self.max_enemies
+        self.closest(
+            out[start:].reshape(self.max_bullets, OBJECT_FEATURES),
+            (bullets.x[:n] + bullets.width / 2 - centre_x) / width,
+            (bullets.y[:n] + bullets.height / 2 - centre_y) / height,
+            bullets.vx[:n] / width,
+            bullets.vy[:n] / height,
+        )
+
+    def closest(self, out, dx, dy, a, b):
+        # Writes the rows (dx, dy, a, b, 1) of the objects closest to the player into out, the rest stay 0
+        rows = len(out)
+        distance = dx * dx + dy * dy
+        if len(distance) > rows:
+            picked = np.argpartition(distance, rows - 1)[:rows]
+            picked = picked[np.argsort(distance[picked])]
+        else:
+            picked = np.argsort(distance)
+        k = len(picked)
+        out[:k, 0] = dx[picked]
+        out[:k, 1] = dy[picked]
+        out[:k, 2] = a[picked]
+        out[:k, 3] = b[picked]
+        out[:k, 4] = 1
+
+    def observe_frame(self, game, out):
+        # Fills out with a downsampled picture of the screen, one channel each for the player's plane,
+        # the enemy planes and the enemy bullets, a cell is 1 where something covers it
+        scale_x = self.frame_size / pyxel.width
+        scale_y = self.frame_size / pyxel.height
+        plane = game.plane
+        self.fill(out[0], np.array([plane.x]), np.array([plane.y]), plane.width, plane.height, scale_x, scale_y)
+        world = game.world
+        n = len(world)
+        self.fill(out[1], world.x[:n], world.y[:n], world.width[:n], world.height[:n], scale_x, scale_y)
+        bullets = game.enemy_bullets
+        n = len(bullets)
+        self.fill(out[2], bullets.x[:n], bullets.y[:n], bullets.width, bullets.height, scale_x, scale_y)
+
+    def fill(self, channel, x, y, width, height, scale_x, scale_y):
+        # Marks the cells covered by the rectangles, every rectangle covers at least one cell
+        size = self.frame_size
+        left = np.clip((x * scale_x).astype(np.intp), 0, size - 1)
+        top = np.clip((y * scale_y).astype(np.intp), 0, size - 1)
+        right = np.clip(np.ceil((x + width) * scale_x).astype(np.intp), left + 1, size)
+        bottom = np.clip(np.ceil((y + height) * scale_y).astype(np.intp), top + 1, size)
+        # Small rectangles (bullets) covering a single cell are marked in one go, the others one by one
+        single = (right - left == 1) & (bottom - top == 1)
+        channel[top[single], left[single]] = 1
+        for i in np.flatnonzero(~single).tolist():
+            channel[top[i]:bottom[i], left[i]:right[i]] = 1
+
+
+# Running "python envs.py --envs 16 --steps 2000" plays random actions in 16 games and prints the steps per second
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the speed of the training environments")
+    parser.add_argument("--envs", type=int, default=16, help="number of games played side by side")
+    parser.add_argument("--steps", type=int, default=1000, help="steps played in every game")
+    parser.add_argument("--observation", choices=["objects", "frame"], default="objects")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    env = VectorEnv(args.envs, args.seed, args.observation)
+    rng = np.random.default_rng(args.seed)
+    env.reset()
+    episodes = []
+    start = perf_counter()
+    for i in range(args.steps):
+        observations, rewards, dones, infos = env.step(rng.integers(0, env.action_count, args.envs))
+        episodes += [info for info in infos if info]
+    elapsed = perf_counter() - start
+    print(json.dumps({
+        "envs": args.envs,
+        "observation_shape": list(env.observation_shape),
+        "steps_per_second": args.envs * args.steps / elapsed,
+        "frames_per_second": args.envs * args.steps * env.frame_skip / elapsed,
+        "episodes": len(episodes),
+        "mean_score": sum(info["score"] for info in episodes) / len(episodes) if episodes else None,
+    }, indent=2))
@@ -1,34 +1,81 @@
+import atexit
+import heapq
+import math
+import os
 import pyxel
-from objects import Plane, Bullet
-from enemy import RegularEnemy, RedEnemy, Bombardier, SuperBombardier
-from graphics import Blast, Background
+from random import Random, randrange
+from time import perf_counter
+from controls import KeyboardControls, ScriptedControls
+from replay import InputRecorder, ReplayControls
+from objects import Plane
+from bullets import BulletStore
+from world import World
+from timeline import Level, DEFAULT_LEVEL
+from graphics import Background
 from cluster_handler import ClusterHandler
+from collision import SpatialHash, masks_overlap
+from hitboxes import load_hitboxes
+from particles import Explosions, Debris
+from snapshot import RewindBuffer
+from timestep import FixedTimestepLoop
+from profiler import FrameProfiler
+from config import PLAYER_BULLET_POOL_SIZE, ENEMY_BULLET_POOL_SIZE, BLAST_POOL_SIZE, DEBRIS_POOL_SIZE, DEBRIS_PER_KILL, SIM_FPS, MAX_CATCH_UP_STEPS, PROFILER_FRAMES, WAVE_PREFETCH_PLANES
 
 # This class literally acts like a manager and manages the interconnections between all the objects
 # This class is the brain of the game while all the other classes are the body
 # It merges all the objects together and makes sure they all work together which naturally means
 # it has to be the most complex class and the messiest class.
 
+# The waves come from a level file (see timeline.py), Assets/level.json unless the game is given another one
+
 
 class GameManager:
     # GamaManger class which handles all game objects and their mechanics (update and draw methods)
-    def __init__(self, parent_w, parent_h):
-        # List of bullets fired by player
-        self.player_bullet_list = []
+    def __init__(self, parent_w, parent_h, headless=False, seed=None, record=False, replay=None, rewind=False, players=1, profile=True, level=None):
+        # Headless mode runs the game logic without a window, it has to be stepped by hand with step()
+        # and never draws, so it can run as fast as the CPU allows
+        self.headless = headless
+
+        # Every random choice in the game comes from this one generator, so a game started with the
+        # same seed and fed the same keys plays out exactly the same
+        # A replay brings its own seed, otherwise a random one is picked when none is given
+        if replay is not None:
+            seed = replay.seed
+        elif seed is None:
+            seed = randrange(2 ** 63)
+        self.seed = seed
+        self.rng = Random(seed)
+
+        # Number of frames the game has been updated for, it times the enemies' shooting and motion
+        self.frame_count = 0
+
+        # Store of bullets fired by player
+        self.player_bullets = BulletStore(PLAYER_BULLET_POOL_SIZE)
         # Max amount of bullet which can be fired
         self.player_bullet_limit = 5
+        # Store of bullets fired by every enemy plane, the bullets keep flying after the plane is gone
+        self.enemy_bullets = BulletStore(ENEMY_BULLET_POOL_SIZE)
 
-        # List of blasts to be rendered
-        self.blast_list = []
+        # Explosions, played back from frames drawn once, and the debris thrown out by destroyed planes
+        self.explosions = Explosions(BLAST_POOL_SIZE)
+        self.debris = Debris(self.rng, DEBRIS_POOL_SIZE)
 
-        # List containing red enemy planes destroyed by player
+        # Whether the player earned the double bullet powerup by destroying a whole bonus wave
         self.bonus = False
 
         # Indicates the current scene
         self.scene = "TITLE"
 
-        # Current enemy wave, 0 for regular enemy, 1 for red, 2 for bombardier, 3 for super bombardier
+        # Waves of enemies played, a Level or the path of a level file, the default level otherwise
+        if level is None or isinstance(level, str):
+            level = Level.load(level or DEFAULT_LEVEL)
+        self.level = level
+        # Current enemy wave, the index in the level's waves
+        # (in the default level 0 for regular enemy, 1 for red, 2 for bombardier, 3 for super bombardier)
         self.wave = 0
+        # Frames since the current wave started and the queue of its spawn events still to come
+        self.wave_frame = 0
+        self.schedule = []
 
         # Score of the player
         self.score = 0
@@ -38,404 +85,464 @@ class GameManager:
         # Total lives of the player
         self.total_lives = 3
 
-        #
-        pyxel.init(parent_w, parent_h, title="Galaxy King")
-        pyxel.load("Assets/asset.pyxres")
-            
+        # Statistics over the whole session (kept across restarts), used by the batch simulator
+        self.waves_cleared = 0
+        self.lives_lost = 0
+
+        # Times every stage of update and draw, F1 shows the overlay and F2 saves the timings to a CSV file
+        # profile=False turns it off, for games run in bulk
+        self.profiler = FrameProfiler(PROFILER_FRAMES, profile)
+
+        # Collision grid for the enemy planes of the world, the player bullets and planes are tested against it
+        # while whole enemy bullet stores are tested against the player at once
+        self.target_grid = SpatialHash()
+        # Solid pixels of every sprite, only the pixels collide and not the transparent corners of the sprites
+        # They are read once and shared by every game of the process
+        self.hitboxes = load_hitboxes()
+
+        if self.headless:
+            # No window is opened, so the screen size pyxel would normally hold is set by hand
+            # as every object reads it from pyxel.width and pyxel.height
+            pyxel.width = parent_w
+            pyxel.height = parent_h
+            # Keys are fed in through step() instead of being read from the keyboard
+            self.controls = ScriptedControls()
+        else:
+            pyxel.init(parent_w, parent_h, title="Galaxy King", fps=SIM_FPS)
+            pyxel.load("Assets/asset.pyxres")
+            self.controls = KeyboardControls()
+
+        if replay is not None:
+            # The keys come from the recording instead
+            self.controls = ReplayControls(replay)
+        # The recording of this game (seed and keys of every frame), only kept when record is set
+        # record can also be a file path, the recording is then saved there when the program exits
+        self.recording = None
+        if record:
+            self.controls = InputRecorder(self.controls, self.seed)
+            self.recording = self.controls.recording
+            if isinstance(record, str):
+                atexit.register(self.recording.save, record)
+
+        # Snapshots of the last few seconds, saved after every frame when rewind is set (see snapshot.py)
+        # self.rewind.rewind(self, frames) then takes the game back in time
+        self.rewind = RewindBuffer() if rewind else None
+
         # Initalizes the background (stars, planets, etc) object
-        self.background = Background()
+        self.background = Background(self.rng)
+
+        # Co-op games have a plane per player sharing the score and lives, the first player uses the controls
+        # above and the others are always scripted, their keys are handed to tick() (see server.py)
+        self.player_controls = [self.controls] + [ScriptedControls() for i in range(players - 1)]
+
+        # Initalizes the plane objects
+        self.spawn_planes()
+
+        # Creates the cluster handler, which places the planes of the clustered waves
+        self.cluster = ClusterHandler(self.rng)
+        # Every enemy plane lives in the world, the next wave is built in a world of its own
+        # while the current one is played (next_wave is its builder, next_world the finished world)
+        self.next_wave = None
+        self.next_world = None
+        self.next_wave_number = 0
+        self.next_build = None
+        self.next_layout = None
+        self.next_event = 0
+        self.next_event_start = 0
+        self.start_waves()
+
+        # In a window the game is updated at a fixed rate no matter how long drawing takes,
+        # loop.stats() reports how many frames were skipped to keep up
+        self.loop = FixedTimestepLoop(self.tick, self.draw, SIM_FPS, MAX_CATCH_UP_STEPS)
+
+        if not self.headless:
+            pyxel.run(self.loop.update, self.loop.draw)
+
+    def tick(self, inputs=(), other_inputs=()):
+        # Runs one frame of the game, inputs are the keys held when the controls are scripted
+        # and other_inputs the keys held by players 2 and up in a co-op game, one set per player
+        self.controls.next_frame(inputs)
+        for i, controls in enumerate(self.player_controls[1:]):
+            controls.next_frame(other_inputs[i] if i < len(other_inputs) else ())
+        self.update()
+        self.frame_count += 1
+        if self.rewind is not None:
+            self.rewind.push(self)
+
+    def step(self, n_frames=1, inputs=(), other_inputs=()):
+        # Advances a headless game by n_frames, holding down the keys in inputs on every one of them
+        # Only update() is called, draw() is skipped entirely
+        # Returns the number of frames simulated per second during this call
+        start = perf_counter()
+        for i in range(n_frames):
+            self.tick(inputs, other_inputs)
+        elapsed = perf_counter() - start
+        return n_frames / elapsed if elapsed > 0 else float("inf")
+
+    def pool_stats(self):
+        # Returns the usage statistics of the bullet, blast and debris stores, used to tune their sizes in config.py
+        return {
+            "player_bullets": self.player_bullets.stats(),
+            "enemy_bullets": self.enemy_bullets.stats(),
+            "blasts": self.explosions.stats(),
+            "debris": self.debris.stats(),
+        }
+
+    def build_wave(self, wave, world=None, layout=None, event=0, event_start=0):
+        # Starts building the planes of a wave's opening events in a new world, or carries on with a build
+        # restored from a snapshot (see snapshot.py): its world, the layout of the formation being built,
+        # the event being built and the number of planes in the world when that event started
+        # Returns a generator which pauses after every plane so the work can be spread over several frames,
+        # and returns the world once it is complete
+        # Where the build has got to is kept on the game so a snapshot can save it
+        self.next_wave_number = wave
+        self.next_build = world if world is not None else World(self.rng, self.enemy_bullets)
+        self.next_layout = layout
+        self.next_event = event
+        self.next_event_start = event_start
+        return self.build_planes(wave, self.next_build)
+
+    def build_planes(self, wave, world):
+        # Generator behind build_wave()
+        events = self.level[wave].opening
+        while self.next_event < len(events):
+            event = events[self.next_event]
+            if event.formation is not None:
+                if self.next_layout is None:
+                    self.next_layout = self.cluster.layout(event.enemy_type, event.formation, event.count)
+                    yield
+                x, y, offsets = self.next_layout
+                built = len(world) - self.next_event_start
+                yield from world.build_formation(event.enemy_type, x, y, offsets, built, event.path)
+            else:
+                world.spawn(event.enemy_type, event.x, event.y, event.path)
+            self.next_event += 1
+            self.next_event_start = len(world)
+            self.next_layout = None
+        return world
+
+    def spawn_event(self, event):
+        # Spawns one of the later events of the current wave straight into the world
+        if event.formation is not None:
+            x, y, offsets = self.cluster.layout(event.enemy_type, event.formation, event.count)
+            self.world.spawn_formation(event.enemy_type, x, y, offsets, event.path)
+        else:
+            self.world.spawn(event.enemy_type, event.x, event.y, event.path)
+
+    def schedule_wave(self):
+        # Starts the clock of the current wave and queues its later events
+        self.wave_frame = 0
+        self.schedule = self.level[self.wave].schedule()
+
+    def prefetch(self, planes=None):
+        # Builds up to the given number of planes of the next wave, or all of them when planes is None
+        while self.next_world is None and (planes is None or planes > 0):
+            try:
+                next(self.next_wave)
+            except StopIteration as finished:
+                self.next_world = finished.value
+            if planes is not None:
+                planes -= 1
+
+    def prefetch_wave(self):
+        # Starts building the wave after the current one
+        self.next_wave = self.build_wave((self.wave + 1) % len(self.level))
+        self.next_world = None
+
+    def start_waves(self):
+        # Builds the first wave straight away and starts building the second one
+        self.wave = 0
+        self.next_wave = self.build_wave(0)
+        self.next_world = None
+        self.prefetch()
+        self.world = self.next_world
+        self.schedule_wave()
+        self.prefetch_wave()
+
+    @property
+    def plane(self):
+        # The first player's plane, the only one outside co-op games
+        return self.planes[0]
+
+    def spawn_planes(self):
+        # Creates a plane for every player, spread evenly over the width of the screen
+        self.planes = [Plane(controls) for controls in self.player_controls]
+        for i, plane in enumerate(self.planes):
+            plane.x = pyxel.width * (i + 1) / (len(self.planes) + 1) - plane.width / 2
+
+    def living_planes(self):
+        # The planes of the players still in the game
+        return [plane for plane in self.planes if plane.alive]
+
+    def hit_player(self, plane):
+        # The player loses a life when hit, or the plane is destroyed if there are no lives left
+        self.lives_lost += 1
+        if self.lives > 0:
+            self.lives -= 1
+        else:
+            plane.alive = False
+
+    def update_player(self, plane):
+        # Moves a player's plane and handles its shooting and flipping
+        controls = plane.controls
+        plane.update()
+
+        # Bullet shooting mechanism
+        # Every player fires into the same store, so the bullet limit goes up with the number of players
+        bullet_limit = self.player_bullet_limit * len(self.planes)
+        if plane.flipping == 0:
+            # If the player presses space, a bullet is fired
+            if plane.double_bullet and plane.double_bullet_timeout > 0:
+                # If the player has the double bullet powerup, two bullets are fired
+                # The double bullet powerup is only active for a certain amount of time
+                # After that, the powerup is deactivated
+                if controls.btnp(pyxel.KEY_X) and len(self.player_bullets) < bullet_limit:
+                    self.player_bullets.spawn(plane.x + plane.head_x + 5, plane.y + plane.head_y)
+                    self.player_bullets.spawn(plane.x + plane.head_x - 5, plane.y + plane.head_y)
+                    plane.double_bullet_timeout -= 1
+
+            elif plane.double_bullet and plane.double_bullet_timeout <= 0:
+                # If the player has the double bullet powerup, but the powerup has expired, only one bullet is fired
+                plane.double_bullet = False
+                plane.double_bullet_timeout = plane.double_bullet_timeout_default
+                self.bonus = False
 
-        # Initalizes the plane object
-        self.plane = Plane()
+            else:
+                # If the player doesn't have the double bullet powerup, only one bullet is fired
+                if controls.btnp(pyxel.KEY_X) and len(self.player_bullets) < bullet_limit:
+                    self.player_bullets.spawn(plane.x + plane.head_x, plane.y + plane.head_y)
 
-        # Creates the cluster handler
-        self.cluster = ClusterHandler()
-        # Initalizes the regular enemy object
-        self.cluster.generate_cluster(RegularEnemy)
-        pyxel.run(self.update, self.draw)
+        # Key for flipping
+        if controls.btnp(pyxel.KEY_Z) and plane.flipping == 0 and plane.flips > 0:
+            plane.flipping = 1
 
     def update(self):
-        # print(len(self.player_bullet_list), len(self.cluster.cluster_list), len(self.blast_list))
+        # Every stage is timed by the profiler, t is where the next stage starts
+        profiler = self.profiler
+        frame_start = t = profiler.start()
+
         self.background.update()
+        t = profiler.record("background", t)
         # Updates the background object
         if self.scene == "TITLE":
             # If the player presses enter, the game starts
-            if pyxel.btnp(pyxel.KEY_RETURN):
+            if self.controls.btnp(pyxel.KEY_RETURN):
                 self.scene = "PLAY"
 
         # All values which were initialized are reset here
         elif self.scene == "GAME_OVER" or self.scene == "WIN":
             # If the player presses enter after dying or winning, the game restarts
-            if pyxel.btnp(pyxel.KEY_RETURN):
+            if self.controls.btnp(pyxel.KEY_RETURN):
                 self.scene = "PLAY"
-                # Resets the plane object
-                # The following handles the errors we get when we restart the game and deletes the old plane object
-                # and enemies, bullets and blasts
-                try:
-                    del self.cluster
-                except AttributeError:
-                    pass
-                try: 
-                    del self.super_bombardier
-                except AttributeError:
-                    pass
-                try: 
-                    del self.cluster
-                except AttributeError:
-                    pass
-
-                del self.plane
-
-                self.wave = 0
+                # Resets the plane object and removes the enemies, bullets and blasts
                 self.bonus = False
                 self.lives = self.total_lives
 
-                self.player_bullet_list.clear()
-                self.blast_list.clear()
+                self.player_bullets.clear()
+                self.enemy_bullets.clear()
+                self.explosions.clear()
+                self.debris.clear()
 
-                self.plane = Plane()
-                self.cluster = ClusterHandler()
-                self.cluster.generate_cluster(RegularEnemy)
+                self.spawn_planes()
+                self.cluster = ClusterHandler(self.rng)
+                self.start_waves()
 
         elif self.scene == "PLAY":
-            # Checks if the player is alive
-            # If the player is alive, the game continues
-            # If the player is dead, the game ends
-            if not self.plane.alive:
+            # Checks if the players are alive
+            # If any player is alive, the game continues
+            # If every player is dead, the game ends
+            if not self.living_planes():
                 self.scene = "GAME_OVER"
-                pyxel.cls(0)
+                if not self.headless:
+                    pyxel.cls(0)
 
             # If the player is alive, it creates the waves of enemies
-            # Since the regular enemies always get created, we only need to check for the other waves
-            # If the player has destroyed all the enemies in the current wave, the next wave is created
-            # If the player has destroyed all the enemies in the last wave, the player wins
-            # 0 for regular enemy, 1 for red, 2 for bombardier
-            # Create wave 1
-            if len(self.cluster.cluster_list) == 0 and self.wave == 0:
-                self.wave = 1
-                self.cluster.cluster_list.clear()
-                self.cluster.generate_cluster(RedEnemy)
-
-            # Create wave 2
-            # Since the bombardier is a special enemy, we need to create it separately
-            # We also need to check if the player has destroyed all the red enemies
-            # But since the bombardier isn't clustered, we don't need to check if the cluster list is empty or
-            # generate a new one
-            elif len(self.cluster.cluster_list) == 0 and self.wave == 1:
-                self.wave = 2
-                self.cluster.cluster_list.clear()
-                self.bombardier = Bombardier()
-
-            # Updates the player plane motions
-            self.plane.update()
-
-            # Bullet shooting mechanism
-            if self.plane.flipping == 0:
-                # If the player presses space, a bullet is fired
-                if self.plane.double_bullet and self.plane.double_bullet_timeout > 0:
-                    # If the player has the double bullet powerup, two bullets are fired
-                    # The double bullet powerup is only active for a certain amount of time
-                    # After that, the powerup is deactivated
-                    if pyxel.btnp(pyxel.KEY_X) and len(self.player_bullet_list) < self.player_bullet_limit:
-                        self.player_bullet_list.append(Bullet(self.plane.x + self.plane.head_x + 5, self.plane.y + self.plane.head_y))
-                        self.player_bullet_list.append(Bullet(self.plane.x + self.plane.head_x - 5, self.plane.y + self.plane.head_y))
-                        self.plane.double_bullet_timeout -= 1
-
-                elif self.plane.double_bullet and self.plane.double_bullet_timeout <= 0:
-                    # If the player has the double bullet powerup, but the powerup has expired, only one bullet is fired
-                    self.plane.double_bullet = False
-                    self.plane.double_bullet_timeout = self.plane.double_bullet_timeout_default
-                    self.bonus = False
-
-                else:
-                    # If the player doesn't have the double bullet powerup, only one bullet is fired
-                    if pyxel.btnp(pyxel.KEY_X) and len(self.player_bullet_list) < self.player_bullet_limit:
-                        self.player_bullet_list.append(Bullet(self.plane.x + self.plane.head_x, self.plane.y + self.plane.head_y))
-                        print(self.bonus)
-
-            # Key for flipping
-
-            if pyxel.btnp(pyxel.KEY_Z) and self.plane.flipping == 0 and self.plane.flips > 0:
-                self.plane.flipping = 1
+            # If every plane of the current wave is gone (shot down or off the screen) and none is still to come,
+            # the next wave comes in, after the last one the level starts over (or is won if it doesn't loop)
+            # The next wave has been built a few planes per frame in the meantime, so it only has to be
+            # finished (usually nothing is left) and swapped in, then building the one after it starts
+            if len(self.world) == 0 and not self.schedule:
+                if self.wave == len(self.level) - 1 and not self.level.loop:
+                    self.scene = "WIN"
+                self.wave = (self.wave + 1) % len(self.level)
+                self.waves_cleared += 1
+                self.prefetch()
+                self.world = self.next_world
+                self.schedule_wave()
+                self.prefetch_wave()
+            else:
+                self.prefetch(WAVE_PREFETCH_PLANES)
+
+            # The later spawn events of the wave which are due, the queue is sorted by frame
+            # so only its top has to be looked at
+            while self.schedule and self.schedule[0][0] <= self.wave_frame:
+                frame, number = heapq.heappop(self.schedule)
+                self.spawn_event(self.level[self.wave].timed[number])
+            self.wave_frame += 1
+
+            t = profiler.record("waves", t)
+
+            # Updates the player planes, a destroyed plane stays out until the game restarts
+            planes = self.living_planes()
+            for plane in planes:
+                self.update_player(plane)
+
+            t = profiler.record("player", t)
+
+            # The grid is rebuilt every frame as everything moves, collisions are then only checked
+            # between objects sharing a grid cell instead of everything against everything
+            # It holds the tight boxes around the solid pixels of the planes (see hitboxes.py), the boxes of all
+            # the bullets are looked up in it in one go, and only the few pairs whose boxes overlap are then
+            # checked pixel by pixel (or not even that when they overlap inside the solid middles of both)
+            world = self.world
+            hitboxes = self.hitboxes
+            enemy_boxes = hitboxes.enemy_kinds().boxes
+            self.target_grid.build(*world.hitboxes(hitboxes))
 
             # Check if enemy has collided with bullet
-            for enemy in self.cluster.cluster_list:
-                for bullet in self.player_bullet_list:
-                    if (
-                        # Checks if the bullet is within the enemy's x and y coordinates
-                        # If it is, the enemy is destroyed
-                        enemy.x + enemy.width > bullet.x
-                        and bullet.x + bullet.width > enemy.x
-                        and enemy.y + enemy.height > bullet.y
-                        and bullet.y + bullet.height > enemy.y
-                    ):
-                        # If the enemy is destroyed, the bullet is deleted
-                        # The enemy is also deleted
-                        bullet.alive = False
-                        enemy.alive = False
-
-                        #
-                        self.score += enemy.points
-
-                        self.blast_list.append(Blast(bullet.x, bullet.y))
-
-                        self.player_bullet_list.remove(bullet)
-                        self.cluster.cluster_list.remove(enemy)
-                        # If the enemy is a red enemy, the player gets the double bullet powerup
-                        if enemy.name == "RedEnemy" and len(self.cluster.cluster_list) == 0 and self.bonus is False:
-                            self.bonus = True
-                            self.plane.double_bullet = True
-
-            # Blast animations
-            for blast in self.blast_list:
-                # If the blast animation is over, the blast is deleted
-                if blast.alive:
-                    blast.update()
+            bonus_enemy_destroyed = False
+            bullets = self.player_bullets
+            shots = bullets.alive_indices()
+            pairs = ()
+            if len(shots) and len(world):
+                pairs = zip(*(values.tolist() for values in self.target_grid.pairs(*bullets.hitboxes(shots, hitboxes))))
+            for shot, enemy in pairs:
+                i = shots[shot]
+                bullet_x = bullets.x[i]
+                bullet_y = bullets.y[i]
+                # A bullet can only hit one plane and a plane can only be destroyed once
+                if not bullets.alive[i] or not world.alive[enemy]:
+                    continue
+                if not masks_overlap(bullets.hitbox(i, hitboxes), bullet_x, bullet_y,
+                                     enemy_boxes[world.kind[enemy]], world.x[enemy], world.y[enemy]):
+                    continue
+
+                bullets.kill(i)
+
+                # Planes with health (the bombardier and super bombardier) take several hits to destroy
+                if world.health[enemy] > 0:
+                    world.health[enemy] -= bullets.damage
                 else:
-                    self.blast_list.remove(blast)
+                    # If the enemy is destroyed, it is deleted and the player gets its points
+                    world.kill(enemy)
+                    self.score += int(world.points[enemy])
+                    if world.type_of(enemy).bonus:
+                        bonus_enemy_destroyed = True
+                    # The plane breaks up from its middle
+                    self.debris.burst(world.x[enemy] + world.width[enemy] / 2,
+                                      world.y[enemy] + world.height[enemy] / 2, DEBRIS_PER_KILL)
+
+                self.explosions.spawn(bullet_x, bullet_y)
+
+            # Destroyed enemies are removed from the world in one pass, which moves the planes left,
+            # so the grid is built again for the crashes below
+            planes_before = len(world)
+            world.compact()
+            if len(world) != planes_before:
+                self.target_grid.build(*world.hitboxes(hitboxes))
+            # If the last enemy destroyed was a bonus (red) enemy, the player gets the double bullet powerup
+            if bonus_enemy_destroyed and len(world) == 0 and self.bonus is False:
+                self.bonus = True
+                for plane in self.planes:
+                    plane.double_bullet = True
+
+            t = profiler.record("hit_enemies", t)
+
+            # Blast animations and debris, the finished ones are removed
+            self.explosions.update()
+            self.debris.update()
+            t = profiler.record("blasts", t)
 
             # Bullet updater
-            for bullet in self.player_bullet_list:
-                # If the bullet is still alive, it updates
-                # If the bullet is dead, it is deleted
-                if bullet.alive:
-                    bullet.update()
-                else:
-                    self.player_bullet_list.remove(bullet)
-
-            # Find player direction and check for bullet collision
-            for enemy in self.cluster.cluster_list:
-                # If the enemy is still alive, it updates
-                enemy.find_player(self.plane)
-                for bullet in enemy.bullet_list:
-                    if (
-                        # Checks if the bullet is within the enemy's x and y coordinates
-                        self.plane.x + self.plane.width > bullet.x
-                        and bullet.x + bullet.width > self.plane.x
-                        and self.plane.y + self.plane.height > bullet.y
-                        and bullet.y + bullet.height > self.plane.y
-                    ):
-                        # If the enemy is destroyed as the bullet is in the enemy's x and y coordinates,
-                        # the bullet is deleted
-                        bullet.alive = False
-
-                        if self.plane.flipping == 0:
-                            # If the player is not flipping, the player is destroyed when hit by a bullet
-                            # if he is flipping, the player is invincible in that time
-                            if self.lives > 0:
-                                self.lives -= 1
-                            else:
-                                self.plane.alive = False
-
-                        self.blast_list.append(Blast(self.plane.x, self.plane.y))
-
-                    # Plane and enemy collision
-                    if (
-                        # Checks if the enemy is within the player's x and y coordinates
-                        self.plane.x + self.plane.width > enemy.x
-                        and enemy.x + enemy.width > self.plane.x
-                        and self.plane.y + self.plane.height > enemy.y
-                        and enemy.y + enemy.height > self.plane.y
-                    ):
-                        # If the enemy is destroyed as the player is in the enemy's x and y coordinates,
-                        # the enemy is deleted
-                        # The player is also destroyed or loses a life
-                        enemy.alive = False
-                        if self.lives > 0:
-                            self.lives -= 1
-                        else:
-                            self.plane.alive = False
-                        # If the player is not flipping, the player is destroyed when hit by an enemy
-                        self.blast_list.append(Blast(self.plane.x, self.plane.y))
-
-            # Enemy plane updater
-            self.cluster.update(self.wave)
-
-            # Check if player bullet has hit bombardier
-            # The following does the same as the above, just modified for the bombardier
-            if self.wave == 2:
-                for bullet in self.player_bullet_list:
-                    if (
-                        self.bombardier.x + self.bombardier.width > bullet.x
-                        and bullet.x + bullet.width > self.bombardier.x
-                        and self.bombardier.y + self.bombardier.height > bullet.y
-                        and bullet.y + bullet.height > self.bombardier.y
-                    ):
-                        # As the bombardier's health is 2, it takes 2 hits to destroy it
-                        if self.bombardier.health > 0:
-                            self.bombardier.health -= bullet.damage
-
-                        else:
-                            # If the bombardier is destroyed, the player gets a bonus
-                            self.bombardier.alive = False
-                            self.score += self.bombardier.points
-
-                        bullet.alive = False
-                        # If the bullet hits the bombardier, the bullet is deleted and the blast list is updated
-                        self.blast_list.append(Blast(self.bombardier.x + self.bombardier.width/2, self.bombardier.y + self.bombardier.height/2))
-
-            # Check if player bullet has hit super_bombardier
-            if self.wave == 3:
-                # The following does the same as the above, just modified for the super bombardier
-                for bullet in self.player_bullet_list:
-                    if (
-                        self.super_bombardier.x + self.super_bombardier.width > bullet.x
-                        and bullet.x + bullet.width > self.super_bombardier.x
-                        and self.super_bombardier.y + self.super_bombardier.height > bullet.y
-                        and bullet.y + bullet.height > self.super_bombardier.y
-                    ):
-                        # As the super Bombardier's health is 3, it takes 3 hits to destroy it
-                        if self.super_bombardier.health > 0:
-                            self.super_bombardier.health -= bullet.damage
-
-                        else:
-                            self.super_bombardier.alive = False
-                            self.score += self.super_bombardier.points
-
-                        bullet.alive = False
-                        # If the bullet hits the super bombardier, the bullet is deleted and the blast list is updated
-                        # Same as above for bombardier
-                        self.blast_list.append(Blast(self.super_bombardier.x + self.super_bombardier.width/2, self.super_bombardier.y + self.super_bombardier.height/2))
-
-
-            # Check for bombardier bullet collision with player
-            if self.wave == 2:
-                self.bombardier.find_player(self.plane)
-                for bullet in self.bombardier.bullet_list:
-                    if (
-                        # Checks if the bombardier bullet is within the player's x and y coordinates
-                        self.plane.x + self.plane.width > bullet.x
-                        and bullet.x + bullet.width > self.plane.x
-                        and self.plane.y + self.plane.height > bullet.y
-                        and bullet.y + bullet.height > self.plane.y
-                    ):
-                        # If the player is destroyed as the bullet is in the player's x and y coordinates,
-                        # the bullet is deleted
-                        # The player is also destroyed or loses a life
-                        bullet.alive = False
-
-                        if self.plane.flipping == 0:
-                            # If the player is not flipping, the player is destroyed when hit by a bullet
-                            if self.lives > 0:
-                                self.lives -= 1
-                            else:
-                                self.plane.alive = False
-
-                        self.blast_list.append(Blast(self.plane.x, self.plane.y))
-
-            # Check for super bombardier bullet collision with player
-            if self.wave == 3:
-                for bullet in self.super_bombardier.bullet_list:
-                    if (
-                        self.plane.x + self.plane.width > bullet.x
-                        and bullet.x + bullet.width > self.plane.x
-                        and self.plane.y + self.plane.height > bullet.y
-                        and bullet.y + bullet.height > self.plane.y
-                    ):
-                        bullet.alive = False
-
-                        if self.plane.flipping == 0:
-                            if self.lives > 0:
-                                self.lives -= 1
-                            else:
-                                self.plane.alive = False
-
-                        self.blast_list.append(Blast(self.plane.x, self.plane.y))
-
-
-            # Player and bombardier collision
-            if self.wave == 2:
-                if (
-                    self.plane.x + self.plane.width > self.bombardier.x
-                    and self.bombardier.x + self.bombardier.width > self.plane.x
-                    and self.plane.y + self.plane.height > self.bombardier.y
-                    and self.bombardier.y + self.bombardier.height > self.plane.y
-                ):
-                    self.bombardier.alive = False
-                    if self.lives > 0:
-                        self.lives -= 1
-                    else:
-                        self.plane.alive = False
-
-                    self.blast_list.append(Blast(self.plane.x, self.plane.y))
-
-            # Player and super bombardier collision
-            if self.wave == 3:
-                if (
-                    self.plane.x + self.plane.width > self.super_bombardier.x
-                    and self.super_bombardier.x + self.super_bombardier.width > self.plane.x
-                    and self.plane.y + self.plane.height > self.super_bombardier.y
-                    and self.super_bombardier.y + self.super_bombardier.height > self.plane.y
-                ):
-                    self.super_bombardier.alive = False
-                    if self.lives > 0:
-                        self.lives -= 1
-                    else:
-                        self.plane.alive = False
-
-                    self.blast_list.append(Blast(self.plane.x, self.plane.y))
-
-
-            if self.wave == 2:
-                if self.bombardier.alive:
-                    self.bombardier.update()
-                else:
-                    del self.bombardier
-
-                    if self.wave == 2:
-                        self.wave = 3
-
-                    self.super_bombardier = SuperBombardier()
-
-            if self.wave == 3:
-                if self.super_bombardier.alive:
-                    self.super_bombardier.update()
-                else:
-                    del self.super_bombardier
-
-                    if self.wave == 3:
-                        self.wave = 0
-                        self.cluster.generate_cluster(RegularEnemy)
-
-            if self.plane.y <= 0:
+            # Moves the living bullets and deletes the dead ones
+            self.player_bullets.update()
+            t = profiler.record("player_bullets", t)
+
+            # Check for enemy bullet collision with player
+            # Every enemy bullet is tested against each player in one go
+            for plane in planes:
+                box = hitboxes.get((0, *plane.sprite()))
+                for i in self.enemy_bullets.hits(box, plane.x, plane.y, hitboxes):
+                    # If the player is in the bullet's x and y coordinates, the bullet is deleted
+                    self.enemy_bullets.kill(i)
+
+                    if plane.flipping == 0:
+                        # If the player is not flipping, the player is destroyed when hit by a bullet
+                        # if he is flipping, the player is invincible in that time
+                        self.hit_player(plane)
+
+                    self.explosions.spawn(plane.x, plane.y)
+
+            t = profiler.record("hit_player", t)
+
+            # Plane and enemy collision, the player's tight box is looked up in the grid
+            # and the planes whose tight box overlaps it are checked pixel by pixel
+            for plane in planes:
+                box = hitboxes.get((0, *plane.sprite()))
+                for enemy in self.target_grid.query_rect(math.floor(plane.x) + box.left, math.floor(plane.y) + box.top,
+                                                         box.width, box.height):
+                    if not world.alive[enemy] or not masks_overlap(box, plane.x, plane.y, enemy_boxes[world.kind[enemy]],
+                                                                   world.x[enemy], world.y[enemy]):
+                        continue
+                    # If the enemy is in the player's x and y coordinates, the enemy is destroyed
+                    # The player is also destroyed or loses a life
+                    world.kill(enemy)
+                    self.hit_player(plane)
+                    self.explosions.spawn(plane.x, plane.y)
+                    self.debris.burst(world.x[enemy] + world.width[enemy] / 2,
+                                      world.y[enemy] + world.height[enemy] / 2, DEBRIS_PER_KILL)
+
+            t = profiler.record("crashes", t)
+
+            # Enemy plane updater, aims, fires and moves every plane and removes the dead ones
+            world.update(self.frame_count, self.living_planes())
+            t = profiler.record("enemies", t)
+
+            # Moves every enemy bullet and deletes the dead ones
+            self.enemy_bullets.update()
+            t = profiler.record("enemy_bullets", t)
+
+            if any(plane.y <= 0 for plane in planes):
                 self.scene = "WIN"
 
+        profiler.record("update", frame_start)
+
     def draw(self):
         # This function draws all the objects on the screen
         # It also draws the score, lives and flips on the screen
+        profiler = self.profiler
+        frame_start = t = profiler.start()
+
         pyxel.cls(0)
 
         self.background.draw()
+        t = profiler.record("draw_background", t)
 
         pyxel.text(0, 0, f"SCORE: {self.score}", 7)
         pyxel.text(pyxel.width - 40, 0, f"LIVES: {self.lives}/{self.total_lives}", 7)
-        pyxel.text(0, pyxel.height - 10, f"FLIPS: {self.plane.flips}/{self.plane.total_flips}", 7)
+        for i, plane in enumerate(self.planes):
+            label = "FLIPS" if len(self.planes) == 1 else f"P{i + 1} FLIPS"
+            pyxel.text(i * 72, pyxel.height - 10, f"{label}: {plane.flips}/{plane.total_flips}", 7)
+        t = profiler.record("draw_hud", t)
 
         # The following code checks for the scene and draws the appropriate objects
         if self.scene == "TITLE":
             self.draw_title()
-            self.plane.draw()
+            for plane in self.planes:
+                plane.draw()
 
         elif self.scene == "PLAY":
-            if self.plane.alive:
-                self.plane.draw()
-
-            for blast in self.blast_list:
-                blast.draw()
+            for plane in self.living_planes():
+                plane.draw()
 
-            for bullet in self.player_bullet_list:
-                if bullet.alive:
-                    bullet.draw()
+            self.explosions.draw()
+            self.debris.draw()
 
-            if self.wave == 2:
-                if self.bombardier.alive:
-                    self.bombardier.draw()
+            self.player_bullets.draw()
 
-            if self.wave == 3:
-                if self.super_bombardier.alive:
-                    self.super_bombardier.draw()
-
-            self.cluster.draw(self.wave)
+            self.world.draw()
+            self.enemy_bullets.draw()
+            t = profiler.record("draw_play", t)
 
         elif self.scene == "GAME_OVER":
             self.draw_game_over()
@@ -443,6 +550,21 @@ class GameManager:
         elif self.scene == "WIN":
             self.draw_win()
 
+        profiler.record("draw", frame_start)
+        self.draw_profiler()
+
+    def draw_profiler(self):
+        # Debug keys for the profiler, only read here as they don't change the game (and aren't recorded)
+        # F1 toggles the timing overlay, F2 saves the timings of the last frames to a CSV file
+        # (the file name is shown on screen for a moment)
+        if pyxel.btnp(pyxel.KEY_F1):
+            self.profiler.overlay = not self.profiler.overlay
+        if pyxel.btnp(pyxel.KEY_F2):
+            self.profiler.export_csv(os.path.abspath(f"profile_{self.frame_count}.csv"))
+        if self.profiler.overlay:
+            self.profiler.draw_overlay()
+        self.profiler.draw_notice()
+
     # The following functions draw the title, game over and win screens
     def draw_title(self):
         pyxel.text(pyxel.width / 2 - 15, pyxel.height / 2 - 10, "WELCOME", pyxel.frame_count % 16)
@@ -1,49 +1,66 @@
+import numpy as np
 import pyxel
-from random import randint
+from config import STAR_COUNT, STAR_LAYERS
 
 
 class Background:
     # Defines the background class which will be used by all the planes
     # The background is a 256x256 image
-    def __init__(self):
-        # Sets the stars to be drawn, also used code from the shooter game example in the docs
-        self.stars = []
+    def __init__(self, rng):
+        # Random number generator of the game, used to place the stars and background objects
+        self.rng = rng
+
+        # Sets the stars to be drawn, the idea came from the shooter game example in the docs
         self.create_objects()
 
-        for i in range(100):
-            # Creates 100 stars with random x,y coordinates and random speeds
-            # The speed is used to determine the color of the star
-            # The speed is also used to determine how fast the star moves(self-explanatory)
-            self.stars.append(
-                (
-                    pyxel.rndi(0, pyxel.width - 1),
-                    pyxel.rndi(0, pyxel.height - 1),
-                    pyxel.rndf(1, 2.5),
-                )
-            )
+        # The stars are split into layers which each scroll at their own speed (parallax)
+        # The speed is used to determine the color of the layer
+        # The speed is also used to determine how fast the layer moves(self-explanatory)
+        self.layer_speeds = np.linspace(1, 2.5, STAR_LAYERS)
+        # How far each layer has scrolled down, wraps around at the bottom of the screen
+        self.layer_offsets = np.zeros(STAR_LAYERS)
+
+        # Creates the stars with random x,y coordinates inside a random layer
+        # numpy's generator is seeded from the game's one so the stars are the same on every replay
+        star_rng = np.random.default_rng(self.rng.getrandbits(32))
+        self.star_x = star_rng.integers(0, pyxel.width, STAR_COUNT)
+        self.star_y = star_rng.integers(0, pyxel.height, STAR_COUNT)
+        self.star_layer = star_rng.integers(0, STAR_LAYERS, STAR_COUNT)
+
+        # Images the layers are drawn into once, created on the first draw (never in headless runs)
+        self.layer_images = None
+
+    def render_layers(self):
+        # Draws the stars of every layer into an image of its own, only done once
+        # After this a layer costs two blt calls per frame no matter how many stars it has
+        self.layer_images = []
+        for layer, speed in enumerate(self.layer_speeds):
+            image = pyxel.Image(pyxel.width, pyxel.height)
+            image.cls(0)
+            # Color depends on the speed of the layer, also taken from the shooter game example
+            color = 12 if speed > 1.8 else 5
+            in_layer = self.star_layer == layer
+            for x, y in zip(self.star_x[in_layer].tolist(), self.star_y[in_layer].tolist()):
+                image.pset(x, y, color)
+            self.layer_images.append(image)
 
     def create_objects(self):
         # Creates the objects for the background
         # The objects are the moon, planet with asteroid belt and little far away galaxies
-        moon = [randint(0, int(pyxel.width / 3)), 0]
-        planet = [randint(moon[0] + 20, 2 * int(pyxel.width / 3)), 0]
-        galaxy = [randint(planet[0] + 20, pyxel.width), 0]
+        moon = [self.rng.randint(0, int(pyxel.width / 3)), 0]
+        planet = [self.rng.randint(moon[0] + 20, 2 * int(pyxel.width / 3)), 0]
+        galaxy = [self.rng.randint(planet[0] + 20, pyxel.width), 0]
 
-        self.moon_speed = randint(1, 3)
-        self.planet_speed = randint(1, 3)
-        self.galaxy_speed = randint(1, 3)
+        self.moon_speed = self.rng.randint(1, 3)
+        self.planet_speed = self.rng.randint(1, 3)
+        self.galaxy_speed = self.rng.randint(1, 3)
 
         self.objects = [moon, planet, galaxy]
 
     def update(self):
-        # Updates the stars
-        for i, (x, y, speed) in enumerate(self.stars):
-            # Moves the stars, also taken from the shooter game example, but modified
-            y += speed
-            # If the star goes off the screen, it is reset to the top
-            if y >= pyxel.height:
-                y -= pyxel.height
-            self.stars[i] = (x, y, speed)
+        # Moves every star layer at once, if a layer goes off the screen it wraps back to the top
+        self.layer_offsets += self.layer_speeds
+        self.layer_offsets %= pyxel.height
 
         self.objects[0][1] += self.moon_speed
         self.objects[1][1] += self.galaxy_speed
@@ -55,54 +72,13 @@ class Background:
             self.create_objects()
 
     def draw(self):
-        # Draws the stars
-        for (x, y, speed) in self.stars:
-            # Draws the stars set as pixels on the screen, with the color depending on speed of the pixel
-            # Also taken from the shooter game example
-            pyxel.pset(x, y, 12 if speed > 1.8 else 5)
+        # Draws the stars, each layer is drawn twice so the part scrolled off the bottom shows at the top
+        if self.layer_images is None:
+            self.render_layers()
+        for image, offset in zip(self.layer_images, self.layer_offsets.tolist()):
+            pyxel.blt(0, offset, image, 0, 0, pyxel.width, pyxel.height, 0)
+            pyxel.blt(0, offset - pyxel.height, image, 0, 0, pyxel.width, pyxel.height, 0)
 
         pyxel.blt(self.objects[0][0], self.objects[0][1], 1, 24, 0, 20, 20)
         pyxel.blt(self.objects[1][0], self.objects[1][1], 1, 48, 0, 20, 20)
         pyxel.blt(self.objects[2][0], self.objects[2][1], 1, 0, 24, 20, 20)
-
-
-class Blast:
-    # This class is used to create the blast effect when the player shoots
-    # It is also used to create the blast effect when the player is hit
-    def __init__(self, x, y):
-        # Sets the blast to be drawn at the given x and y coordinates
-        # with the given radius
-        self.x = x
-        self.y = y
-
-        self.u = 0
-        self.v = 0
-
-        self.width = 8
-        self.height = 8
-
-        self.alive = True
-
-        self.radius = 4
-        self.max_radius = 10
-
-    def update(self):
-        # Updates the blast
-        # If the blast is at the max radius, it is set to be dead
-        if self.radius < self.max_radius:
-            self.radius += 1
-        else:
-            self.alive = False
-
-    def draw(self):
-        # Draws the blast
-        # which is a circle that gets bigger
-        # It is drawn with the pyxel.circ function
-        # The pyxel.circb function is used to draw the border of the circle
-        if self.radius == self.max_radius:
-            # If the blast is at the max radius, it is drawn with a different colour
-            pyxel.blt(self.x, self.y, 1, self.u, self.v, self.width, self.height, 0)
-        else:
-            # If the blast is not at the max radius, it is drawn with a different colour
-            pyxel.circ(self.x, self.y, self.radius, 7)
-            pyxel.circb(self.x, self.y, self.radius, 10)
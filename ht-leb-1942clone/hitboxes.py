@@ -0,0 +1,249 @@
+import hashlib
+import os
+import zipfile
+import numpy as np
+from objects import FLIP_FRAMES
+from enemy import ENEMY_TYPES
+from patterns import PATTERN_LIST
+from bullets import BULLET_WIDTH, BULLET_HEIGHT, PLAYER_BULLET_U, PLAYER_BULLET_V
+
+# This file finds the pixels of the sprites which actually collide
+# Colliding whole sprite rectangles makes the transparent corners count as hits, so instead every sprite
+# the game collides with, given as (image bank, u, v, width, height), gets a hitbox: a mask of its solid
+# (not transparent) pixels and the smallest rectangle around them (its tight bounding box)
+#
+# Collisions are tested in two phases: the tight boxes first, which is a few comparisons and rules out almost
+# every pair, then only the pairs left over have their masks laid on top of each other (see collision.py)
+#
+# The masks are read from the image banks of the resource file once, when the first game starts
+# Decoding the banks is the slow part, so the masks are also saved in a cache file named after a hash
+# of the resource file and read back from there by later runs, editing the sprites gives a new cache file
+
+# Folder of this file, the assets and the cache are found from it
+HERE = os.path.dirname(os.path.abspath(__file__))
+ASSET = os.path.join(HERE, "Assets", "asset.pyxres")
+CACHE_DIR = os.path.join(HERE, "Assets", ".hitbox_cache")
+# Changing how the cache is written changes this, so old cache files are not read
+CACHE_VERSION = b"1"
+
+# Colour 0 is transparent when the sprites are drawn, every other colour is solid
+TRANSPARENT = 0
+
+
+class Hitbox:
+    # The solid pixels of one sprite
+    def __init__(self, pixels):
+        rows = np.flatnonzero(pixels.any(axis=1))
+        columns = np.flatnonzero(pixels.any(axis=0))
+        if len(rows) == 0:
+            # A sprite with no solid pixel never collides
+            self.left = self.top = self.width = self.height = 0
+        else:
+            # The tight bounding box, relative to the top left corner of the sprite
+            self.left = int(columns[0])
+            self.top = int(rows[0])
+            self.width = int(columns[-1]) + 1 - self.left
+            self.height = int(rows[-1]) + 1 - self.top
+        # Mask of the solid pixels inside the tight box, a row per pixel row
+        self.mask = pixels[self.top:self.top + self.height, self.left:self.left + self.width].copy()
+        # The same rows as Python integers, bit i set when pixel i of the row is solid, so two rows are
+        # compared with a shift and an and instead of slicing arrays
+        self.rows = [int.from_bytes(np.packbits(row, bitorder="little").tobytes(), "little") for row in self.mask]
+        # The largest rectangle of solid pixels (left, top, width and height, relative to the top left corner
+        # of the sprite), two sprites whose boxes only overlap inside both of their cores certainly touch
+        # (see collision.masks_overlap())
+        left, top, width, height = solid_core(self.mask)
+        self.core = (self.left + left, self.top + top, width, height)
+
+
+class EnemyHitboxes:
+    # Hitboxes of every enemy type, indexed by the type's number (the kind the World stores for each plane)
+    def __init__(self, boxes):
+        self.boxes = boxes
+        # Tight box (left, top, width and height) of every type, a row each, so the boxes of every plane
+        # of the World are looked up at once from their kinds
+        self.edges = np.array([(box.left, box.top, box.width, box.height) for box in boxes],
+                              dtype=np.float64).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+class Hitboxes:
+    # Hitboxes of the sprites of a resource file, by (image bank, u, v, width, height)
+    def __init__(self, path=ASSET, cache_dir=CACHE_DIR):
+        self.path = path
+        self.cache_dir = cache_dir
+        with open(path, "rb") as file:
+            self.digest = hashlib.sha256(CACHE_VERSION + file.read()).hexdigest()
+        self.boxes = {}
+        # Image banks of the resource file, only decoded when a sprite isn't in the cache
+        self.banks = None
+        # Tight boxes shared by every sprite of a size (for the bullets) and by enemy type (for the enemies)
+        self.shared = {}
+        self.kinds = None
+        self.read_cache()
+
+    def cache_path(self):
+        return os.path.join(self.cache_dir, self.digest[:16] + ".npz")
+
+    def load(self, sprites):
+        # Gets the hitboxes of the given sprites, the cache is read when the hitboxes are made and is written again
+        # when any sprite had to be read from the image banks
+        missing = [sprite for sprite in dict.fromkeys(sprites) if sprite not in self.boxes]
+        for sprite in missing:
+            self.get(sprite)
+        if missing:
+            self.write_cache()
+
+    def read_cache(self):
+        try:
+            with np.load(self.cache_path(), allow_pickle=False) as data:
+                sprites = data["sprites"]
+                pixels = data["pixels"]
+        except (OSError, KeyError, ValueError):
+            return
+        start = 0
+        for sprite in sprites.tolist():
+            bank, u, v, width, height = sprite
+            end = start + width * height
+            self.boxes[tuple(sprite)] = Hitbox(pixels[start:end].reshape(height, width))
+            start = end
+
+    def write_cache(self):
+        # Saves every hitbox known, a failed write (e.g. a read only folder) only means no cache next time
+        sprites = list(self.boxes)
+        pixels = [self.pixels(sprite).ravel() for sprite in sprites]
+        path = self.cache_path()
+        temporary = f"{path}.{os.getpid()}"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temporary, "wb") as file:
+                np.savez_compressed(file, sprites=np.array(sprites, dtype=np.int32).reshape(-1, 5),
+                                    pixels=np.concatenate(pixels) if pixels else np.zeros(0, dtype=bool))
+            # Renamed in one go, so another process never reads a half written file
+            os.replace(temporary, path)
+        except OSError:
+            pass
+
+    def pixels(self, sprite):
+        # The whole sprite rectangle as a mask, rebuilt from the hitbox
+        bank, u, v, width, height = sprite
+        box = self.boxes[sprite]
+        pixels = np.zeros((height, width), dtype=bool)
+        pixels[box.top:box.top + box.height, box.left:box.left + box.width] = box.mask
+        return pixels
+
+    def get(self, sprite):
+        # Returns the hitbox of a sprite, reading it from the image banks if it isn't known yet
+        box = self.boxes.get(sprite)
+        if box is not None:
+            return box
+        if self.banks is None:
+            self.banks = read_image_banks(self.path)
+        bank, u, v, width, height = sprite
+        pixels = np.zeros((height, width), dtype=bool)
+        solid = self.banks[bank][v:v + height, u:u + width] != TRANSPARENT
+        pixels[:solid.shape[0], :solid.shape[1]] = solid
+        self.boxes[sprite] = box = Hitbox(pixels)
+        self.shared.pop((bank, width, height), None)
+        return box
+
+    def shared_box(self, bank, width, height):
+        # Returns the left, top, width and height of the smallest box holding the tight boxes of every
+        # width x height sprite of a bank, for stores of same sized objects (the bullets) whose boxes are all
+        # tested against it at once, the few objects inside it are then checked with their own hitbox
+        # Only the sprites loaded count, which is why load_hitboxes() loads every bullet pattern's sprite
+        shared = self.shared.get((bank, width, height))
+        if shared is None:
+            boxes = [box for (sprite_bank, u, v, sprite_width, sprite_height), box in self.boxes.items()
+                     if (sprite_bank, sprite_width, sprite_height) == (bank, width, height) and box.width > 0]
+            if boxes:
+                left = min(box.left for box in boxes)
+                top = min(box.top for box in boxes)
+                right = max(box.left + box.width for box in boxes)
+                bottom = max(box.top + box.height for box in boxes)
+                shared = (left, top, right - left, bottom - top)
+            else:
+                # Sprites of this size with no hitbox yet keep their whole rectangle
+                shared = (0, 0, width, height)
+            self.shared[(bank, width, height)] = shared
+        return shared
+
+    def enemy_kinds(self):
+        # Returns the EnemyHitboxes of every enemy type, made again when enemy types were added since the last call
+        if self.kinds is None or len(self.kinds) < len(ENEMY_TYPES):
+            self.kinds = EnemyHitboxes([self.get((0, kind.u, kind.v, kind.width, kind.height)) for kind in ENEMY_TYPES])
+        return self.kinds
+
+
+def solid_core(mask):
+    # Returns the largest rectangle of solid pixels of a mask as its left, top, width and height
+    # Row by row, every column holds the number of solid pixels running up from it, and the largest
+    # rectangle standing on the row is found from those heights with a stack of rising heights
+    best = (0, 0, 0, 0)
+    best_area = 0
+    heights = [0] * mask.shape[1]
+    for row, pixels in enumerate(mask.tolist()):
+        heights = [height + 1 if solid else 0 for height, solid in zip(heights, pixels)]
+        # (first column, height) of the rectangles still growing to the right
+        stack = []
+        for column, height in enumerate(heights + [0]):
+            start = column
+            while stack and stack[-1][1] >= height:
+                start, tallest = stack.pop()
+                if tallest * (column - start) > best_area:
+                    best_area = tallest * (column - start)
+                    best = (start, row + 1 - tallest, column - start, tallest)
+            stack.append((start, height))
+    return best
+
+
+def read_image_banks(path):
+    # Returns the image banks of a pyxel resource file as arrays of colour numbers, a row per pixel row
+    # Resource files saved by pyxel 1 keep each bank as lines of hexadecimal digits, one per pixel,
+    # the ones saved by pyxel 2 keep them in a TOML file as lists of numbers
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        banks = []
+        if "pyxel_resource.toml" in names:
+            import tomllib
+            resource = tomllib.loads(archive.read("pyxel_resource.toml").decode())
+            for image in resource.get("images", []):
+                bank = np.zeros((image["height"], image["width"]), dtype=np.uint8)
+                # Rows can be cut short, the missing pixels are 0
+                for row, values in enumerate(image["data"]):
+                    bank[row, :len(values)] = values
+                banks.append(bank)
+        else:
+            while f"pyxel_resource/image{len(banks)}" in names:
+                lines = archive.read(f"pyxel_resource/image{len(banks)}").split()
+                digits = np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(len(lines), -1)
+                # "0" to "9" are 48 to 57 and "a" to "f" are 97 to 102
+                banks.append(np.where(digits >= 97, digits - 87, digits - 48).astype(np.uint8))
+    return banks
+
+
+def entity_sprites():
+    # Every sprite which collides: the player's plane and its flipping frames, the enemy types and the bullets
+    # The plane's own sprite is the one set up in Plane
+    sprites = [(0, 0, 0, 32, 32)]
+    sprites += [(0, u, v, width, height) for u, v, width, height in FLIP_FRAMES.values()]
+    sprites += [(0, kind.u, kind.v, kind.width, kind.height) for kind in ENEMY_TYPES]
+    sprites += [(0, PLAYER_BULLET_U, PLAYER_BULLET_V, BULLET_WIDTH, BULLET_HEIGHT)]
+    sprites += [(0, pattern.u, pattern.v, BULLET_WIDTH, BULLET_HEIGHT) for pattern in PATTERN_LIST]
+    return sprites
+
+
+# Hitboxes loaded by this process, by resource file
+LOADED = {}
+
+
+def load_hitboxes(path=ASSET):
+    # The hitboxes of every entity sprite, read once per process and shared by every game
+    # Enemy types and bullet patterns made after that are added as the next game starts
+    hitboxes = LOADED.get(path)
+    if hitboxes is None:
+        hitboxes = LOADED[path] = Hitboxes(path)
+    hitboxes.load(entity_sprites())
+    return hitboxes
@@ -1,4 +1,9 @@
+import argparse
+import os
+from time import perf_counter
+import pyxel
 from game_manager import GameManager
+from replay import Recording
 
 # This is the main file that runs the game
 # it consists of the game manager class which handles the game logic
@@ -7,19 +12,63 @@ from game_manager import GameManager
 
 class App:
     # This class is the main class that runs the game
-    def __init__(self, width=256, height=256):
+    def __init__(self, width=256, height=256, seed=None, record=False, level=None):
         # Initializes the game
         self.width = width
         self.height = height
         # Creates the game manager object which was imported from the game_manager.py file
-        self.game_manager = GameManager(self.width, self.height)
+        self.game_manager = GameManager(self.width, self.height, seed=seed, record=record, level=level)
 
     def update(self):
         # Updates the game manager
-        self.game_manager.update()
+        self.game_manager.tick()
 
     def draw(self):
         # Draws the game manager
         self.game_manager.draw()
 
-App()
+def run_headless(frames, width=256, height=256, seed=None, level=None):
+    # Runs the game without a window for the given number of frames and prints the simulation speed
+    # Used to measure throughput and soak test long sessions on machines with no display
+    game_manager = GameManager(width, height, headless=True, seed=seed, level=level)
+    # Presses enter once to leave the title screen
+    game_manager.step(1, {pyxel.KEY_RETURN})
+    start = perf_counter()
+    for i in range(frames):
+        # Taps the fire key every other frame (a held key only counts as one press)
+        game_manager.step(1, {pyxel.KEY_X} if i % 2 == 0 else ())
+    elapsed = perf_counter() - start
+    print(f"{frames} frames simulated at {frames / elapsed:.0f} frames per second (seed {game_manager.seed})")
+    for name, stats in game_manager.pool_stats().items():
+        print(name, stats)
+
+
+def run_replay(path, width=256, height=256):
+    # Plays a recorded game again without a window, frame for frame, and prints the result
+    recording = Recording.load(path)
+    game_manager = GameManager(width, height, headless=True, replay=recording)
+    fps = game_manager.step(len(recording))
+    print(f"{len(recording)} frames replayed at {fps:.0f} frames per second")
+    print(f"score {game_manager.score}, lives {game_manager.lives}, wave {game_manager.wave}")
+
+
+# Running "python main.py --headless 10000" simulates 10000 frames without opening a window
+# "python main.py --record game.rec" plays normally and saves every key pressed to game.rec
+# "python main.py --replay game.rec" then replays that exact game without a window
+# "python main.py --level my_level.json" plays the waves of another level file (see timeline.py)
+parser = argparse.ArgumentParser(description="Galaxy King, a 1942 clone")
+parser.add_argument("--headless", type=int, metavar="FRAMES", help="simulate FRAMES frames without a window")
+parser.add_argument("--seed", type=int, help="seed of the random number generator")
+parser.add_argument("--record", metavar="FILE", help="save the keys of this game to FILE")
+parser.add_argument("--replay", metavar="FILE", help="replay a game saved with --record")
+parser.add_argument("--level", metavar="FILE", help="level file to play instead of Assets/level.json")
+args = parser.parse_args()
+
+if args.replay:
+    run_replay(args.replay)
+elif args.headless:
+    run_headless(args.headless, seed=args.seed, level=args.level)
+else:
+    # pyxel.init changes the working directory, so the recording and level paths are made absolute first
+    App(seed=args.seed, record=os.path.abspath(args.record) if args.record else False,
+        level=os.path.abspath(args.level) if args.level else None)
@@ -1,12 +1,24 @@
 import pyxel
+from controls import KeyboardControls
 
 # This is the player class, it handles the player's movement and shooting
 # It also handles the player's health and score
 # It also handles the player's death
 
+# Frames of the flipping animation which don't use the plane's own sprite, as u, v, width and height,
+# by the flipping time integer divided by the flip frame rate (left, bottom and right flip)
+FLIP_FRAMES = {
+    4: (8, 34, 16, 32),
+    3: (0, 96, 32, 32),
+    2: (8, 64, 16, 32),
+}
+
 class Plane:
     # Defines the player plane class
-    def __init__(self):
+    def __init__(self, controls=None):
+        # Where the plane reads its keys from, the keyboard unless told otherwise (e.g. headless runs)
+        self.controls = controls if controls is not None else KeyboardControls()
+
         # u, v indicate the starting coordinates of the sprite
         self.u = 0
         self.v = 0
@@ -34,6 +46,10 @@ class Plane:
 
         self.alive = True
 
+        # Distance moved on the last frame, enemies leading their shots use it
+        self.vx = 0
+        self.vy = 0
+
         # Indicates if the plane is currently flipping
         self.flipping = 0
         # Total number of flips a player has
@@ -48,30 +64,55 @@ class Plane:
         self.flipping_time = self.flipping_time_default
 
     def update(self):
+        # Where the plane starts this frame, to work out how far it moved
+        start_x = self.x
+        start_y = self.y
+        # The flip ends once the flipping time reaches the last frame of the flipping animation
+        # (the flipping time integer divided by the flip frame rate is 1), so the plane moves again from this frame on
+        # This is game state, so it happens here and not in draw(), which headless games never call
+        # The flipping time is reset to the default value
+        if self.flipping == 1 and self.flipping_time // self.flip_frame_rate <= 1:
+            self.flipping = 0
+            self.flipping_time = self.flipping_time_default
+            # We have 6 flips in total and this decrements it by 1 each time the plane flips
+            self.flips -= 1
+
         # All ifs instead of elif's to allow diagonal movements
         # Allows movement only if within window dimensions and when plane is not flipping
         if self.flipping == 0:
             # Move left
-            if pyxel.btn(pyxel.KEY_LEFT) and (self.x - self.speed) >= 0:
+            if self.controls.btn(pyxel.KEY_LEFT) and (self.x - self.speed) >= 0:
                 self.x -= self.speed
 
             # Move right
-            if pyxel.btn(pyxel.KEY_RIGHT) and (self.x + self.speed) <= (pyxel.width - self.width):
+            if self.controls.btn(pyxel.KEY_RIGHT) and (self.x + self.speed) <= (pyxel.width - self.width):
                 self.x += self.speed
 
             # Not 0 to prevent upper margin and allow plane to reach top end
             # Move up
-            if pyxel.btn(pyxel.KEY_UP) and (self.y - self.speed) >= -self.height + self.speed:
+            if self.controls.btn(pyxel.KEY_UP) and (self.y - self.speed) >= -self.height + self.speed:
                 self.y -= self.speed
 
             # Move down
-            if pyxel.btn(pyxel.KEY_DOWN) and (self.y + self.speed) <= (pyxel.height - self.height):
+            if self.controls.btn(pyxel.KEY_DOWN) and (self.y + self.speed) <= (pyxel.height - self.height):
                 self.y += self.speed
         else:
             # Reduce flipping time if plane is flipping
             if self.flipping_time > 0:
                 self.flipping_time -= 1
 
+        # Distance moved this frame
+        self.vx = self.x - start_x
+        self.vy = self.y - start_y
+
+    def sprite(self):
+        # Returns the u, v, width and height of the frame the plane is drawn with, its pixels are what collides
+        if self.flipping == 1:
+            frame = FLIP_FRAMES.get(self.flipping_time // self.flip_frame_rate)
+            if frame is not None:
+                return frame
+        return self.u, self.v, self.width, self.height
+
     def draw(self):
         # Draws the plane
         # If the plane is flipping, the plane is drawn with the flipping animation
@@ -110,61 +151,6 @@ class Plane:
                 pyxel.blt(self.x, self.y, 0, u, v, w, h, 0)
 
             # Flip back to normal position if the flipping time is equal to 1
-            # This is the last frame of the flipping animation
-            # The flipping time is reset to the default value
+            # This is the last frame of the flipping animation, the flip itself ends in update()
             elif (self.flipping_time // self.flip_frame_rate) ==  1:
                 pyxel.blt(self.x, self.y, 0, self.u, self.v, self.width, self.height, 0)
-                self.flipping = 0
-                self.flipping_time = self.flipping_time_default
-                # We have 6 flips in total and this decrements it by 1 each time the plane flips
-                self.flips -= 1
-
-class Bullet:
-    # Defines the bullet class which will be used by all of the planes
-    def __init__(self, plane_head_x, plane_head_y, u=69, v=85, direction=(0, -1), speed=10):
-        self.x = plane_head_x
-        self.y = plane_head_y
-
-        self.u = u
-        self.v = v
-
-        self.width = 6
-        self.height = 6
-
-        # Velocity of bullet
-        self.speed = speed
-
-        self.alive = True
-
-        # Damage the bullet will impact 
-        self.damage = 10
-
-        # Direction of bullet, default is upwards
-        # Note: All directions throughout this code work somewhat like unit vectors.
-        # (-1, 0) meaning left, (1, 0) right, etc
-        # Available directions are 8. left, right, up, down and 4 diagonals
-        self.direction = direction
-    
-    def update(self):
-        # Multiply the speeds in the direction vector to get the actual speed
-        self.x += self.direction[0] * self.speed
-        self.y += self.direction[1] * self.speed
-
-        # Check if bullet is out of boundary
-        if (
-            # Left boundary check
-            self.y < 0 or
-            self.y > pyxel.height - self.height or
-            self.x < 0 or 
-            self.x > pyxel.width - self.width and 
-            self.alive
-            ):
-            # If out of boundary, kill the bullet which will not be drawn in the next function
-            self.alive = False
-
-    def draw(self):
-        # Draws the bullet fired by the player plane
-        # If the bullet is alive
-        # If the bullet is not alive, it will not be drawn
-        pyxel.blt(self.x, self.y, 0, self.u, self.v, self.width, self.height, 0)
-
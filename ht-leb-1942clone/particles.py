@@ -0,0 +1,206 @@
+import numpy as np
+import pyxel
+
+# This file holds the explosions and the debris flying out of destroyed planes
+# Like the bullets, they are kept in flat numpy arrays (one for x, one for y and so on) instead of one
+# object each, so updating thousands of them is a handful of array operations per frame
+# The growing circles of an explosion are drawn once into an image the first time they are needed
+# and every explosion after that is a single blt of the right frame
+
+
+def grown(array, capacity):
+    # Returns the array with zeros added up to the given capacity
+    return np.concatenate((array, np.zeros(capacity - len(array), dtype=array.dtype)))
+
+
+class Explosions:
+    # Struct of arrays holding the explosions, slot i of every array belongs to the same explosion
+    # An explosion is a circle growing by a pixel every frame, ending with the blast sprite of image bank 1
+    def __init__(self, capacity=32):
+        # Number of explosions on the screen, they always sit in slots 0 to count - 1
+        self.count = 0
+
+        self.start_radius = 4
+        self.max_radius = 10
+
+        # Centre of the explosion (top left corner of the final sprite) and the radius of its circle
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.radius = np.zeros(capacity, dtype=np.int8)
+
+        # Statistics used to tune the pool size in config.py
+        self.high_water_mark = 0
+        self.grow_count = 0
+
+        # Image holding every frame of the growing circle side by side, created on the first draw
+        # (never in headless runs), and the size of one frame
+        self.frames = None
+        self.frame_size = 2 * self.max_radius + 1
+
+    def __len__(self):
+        return self.count
+
+    def arrays(self):
+        # All the per explosion arrays, in the order they are declared
+        return [self.x, self.y, self.radius]
+
+    def reserve(self, extra):
+        # Makes sure there is room for extra more explosions, doubling the arrays when they are full
+        needed = self.count + extra
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.grow_count += 1
+        self.x, self.y, self.radius = [grown(array, capacity) for array in self.arrays()]
+
+    def spawn(self, x, y):
+        # Starts an explosion at x, y
+        self.reserve(1)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.radius[i] = self.start_radius
+        self.count += 1
+        self.high_water_mark = max(self.high_water_mark, self.count)
+
+    def clear(self):
+        # Removes every explosion
+        self.count = 0
+
+    def update(self):
+        # Explosions at the max radius are over and removed, the others grow by one
+        n = self.count
+        if n == 0:
+            return
+        keep = np.flatnonzero(self.radius[:n] < self.max_radius)
+        m = len(keep)
+        if m < n:
+            for array in self.arrays():
+                array[:m] = array[keep]
+            self.count = m
+        self.radius[:m] += 1
+
+    def stats(self):
+        # Returns the pool statistics as a dictionary
+        return {
+            "capacity": len(self.x),
+            "in_use": self.count,
+            "high_water_mark": self.high_water_mark,
+            "grow_count": self.grow_count,
+        }
+
+    def render_frames(self):
+        # Draws the circle of every radius (filled in white with a yellow border) into one image
+        size = self.frame_size
+        radii = range(self.start_radius, self.max_radius)
+        self.frames = pyxel.Image(size * len(radii), size)
+        self.frames.cls(0)
+        for frame, radius in enumerate(radii):
+            centre_x = frame * size + self.max_radius
+            self.frames.circ(centre_x, self.max_radius, radius, 7)
+            self.frames.circb(centre_x, self.max_radius, radius, 10)
+
+    def draw(self):
+        # Draws every explosion, the circle frames are centred on the explosion
+        if self.frames is None:
+            self.render_frames()
+        n = self.count
+        size = self.frame_size
+        offset = self.max_radius
+        for x, y, radius in zip(self.x[:n].tolist(), self.y[:n].tolist(), self.radius[:n].tolist()):
+            if radius == self.max_radius:
+                # The last frame is the blast sprite
+                pyxel.blt(x, y, 1, 0, 0, 8, 8, 0)
+            else:
+                pyxel.blt(x - offset, y - offset, self.frames, (radius - self.start_radius) * size, 0, size, size, 0)
+
+
+class Debris:
+    # Struct of arrays holding the pieces flying out of destroyed planes
+    # Every piece is a single pixel which moves in a straight line until its lifetime runs out
+    def __init__(self, rng, capacity=256):
+        # numpy generator seeded from the game's one, so the debris is the same on every replay
+        self.rng = np.random.default_rng(rng.getrandbits(32))
+        self.count = 0
+
+        # Position, velocity, frames left to live and colour of every piece
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.vx = np.zeros(capacity, dtype=np.float64)
+        self.vy = np.zeros(capacity, dtype=np.float64)
+        self.life = np.zeros(capacity, dtype=np.int16)
+        self.color = np.zeros(capacity, dtype=np.int8)
+
+        # Statistics used to tune the pool size in config.py
+        self.high_water_mark = 0
+        self.grow_count = 0
+
+    def __len__(self):
+        return self.count
+
+    def arrays(self):
+        # All the per piece arrays, in the order they are declared
+        return [self.x, self.y, self.vx, self.vy, self.life, self.color]
+
+    def reserve(self, extra):
+        # Makes sure there is room for extra more pieces, doubling the arrays when they are full
+        needed = self.count + extra
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.grow_count += 1
+        self.x, self.y, self.vx, self.vy, self.life, self.color = [grown(array, capacity) for array in self.arrays()]
+
+    def burst(self, x, y, count=12, speed=2.0, life=(8, 16), colors=(7, 9, 10)):
+        # Throws count pieces out of x, y in random directions, all added in one batch
+        self.reserve(count)
+        start = self.count
+        end = start + count
+        angles = self.rng.uniform(0, 2 * np.pi, count)
+        speeds = self.rng.uniform(0.5, 1, count) * speed
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end] = np.cos(angles) * speeds
+        self.vy[start:end] = np.sin(angles) * speeds
+        self.life[start:end] = self.rng.integers(life[0], life[1], count)
+        self.color[start:end] = self.rng.choice(colors, count)
+        self.count = end
+        self.high_water_mark = max(self.high_water_mark, self.count)
+
+    def clear(self):
+        # Removes every piece
+        self.count = 0
+
+    def update(self):
+        # Moves every piece and removes the ones whose time is up
+        n = self.count
+        if n == 0:
+            return
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.life[:n] -= 1
+        keep = np.flatnonzero(self.life[:n] > 0)
+        m = len(keep)
+        if m < n:
+            for array in self.arrays():
+                array[:m] = array[keep]
+            self.count = m
+
+    def stats(self):
+        # Returns the pool statistics as a dictionary
+        return {
+            "capacity": len(self.x),
+            "in_use": self.count,
+            "high_water_mark": self.high_water_mark,
+            "grow_count": self.grow_count,
+        }
+
+    def draw(self):
+        # Draws every piece, pyxel can only draw one pixel per call
+        n = self.count
+        for x, y, color in zip(self.x[:n].tolist(), self.y[:n].tolist(), self.color[:n].tolist()):
+            pyxel.pset(x, y, color)
@@ -0,0 +1,48 @@
+import numpy as np
+
+# This file holds the flight paths of the planes which loop around (like the red enemies' circles)
+# A path is periodic, so every point of it is worked out once when the game starts and stored in a table
+# indexed by the phase of the frame (frame count modulo the period of the path)
+# Every plane on the same path is at the same phase, so a frame only needs one lookup per path
+# and no sin or cos at all, however many planes follow it
+#
+# A path is a function of the frame (an array of frames 0 to period - 1) returning the x and y offsets
+# of the plane from its centre, for a radius of 1, new paths only need to be added with add_path()
+
+
+class PathTable:
+    # One periodic path sampled at every frame of its period
+    def __init__(self, name, period, function):
+        self.name = name
+        self.period = period
+        frames = np.arange(period, dtype=np.float64)
+        x, y = function(frames)
+        # Offsets of the path for a radius of 1, by phase
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+
+    def offset(self, frame_count):
+        # Returns the (x, y) offset of the path on the given frame
+        phase = frame_count % self.period
+        return self.x[phase], self.y[phase]
+
+
+# Every path, the World stores the index of a plane's path in this list
+PATH_TABLES = []
+# Index of every path in PATH_TABLES, by name
+PATHS = {}
+
+
+def add_path(name, period, function):
+    # Samples a new path and makes it available to enemy types under the given name
+    PATHS[name] = len(PATH_TABLES)
+    PATH_TABLES.append(PathTable(name, period, function))
+    return PATHS[name]
+
+
+# The red enemies' circle, 0.08 radians a frame restarting every 240 frames like it always did
+add_path("circle", 240, lambda t: (np.sin(t * 0.08), np.cos(t * 0.08)))
+# A figure of eight, the plane goes up and down twice for every time it goes from side to side
+add_path("figure_eight", 240, lambda t: (np.sin(t * np.pi / 120), np.sin(t * np.pi / 60) / 2))
+# Weaves up and down while the centre of the path drifts to the right
+add_path("sine_weave", 120, lambda t: (np.zeros_like(t), np.sin(t * np.pi / 60)))
@@ -0,0 +1,118 @@
+import numpy as np
+
+# This file holds the bullet patterns, which describe how the enemy planes shoot
+# A pattern is only data: how many bullets a shot has, how far apart they are spread, whether the shot
+# is aimed at the player, how much it turns from one shot to the next and how many volleys it fires
+# Rings, spirals, aimed spreads, delayed bursts and rotating emitters are all the same code with other numbers
+# The bullets of every plane firing a pattern on a frame are worked out together with array operations
+# and handed back as flat arrays, ready to be added to a bullet store in one batch
+
+
+class BulletPattern:
+    # One way of shooting, shared by every plane using it
+    def __init__(self, name, count=1, spread=0.0, aimed=True, angle=0.0, spin=0.0, volleys=1, delay=0,
+                 from_centre=False, square=False, u=69, v=101):
+        self.name = name
+        # Bullets fired per volley, fanned out evenly over spread radians
+        # A spread of a full turn (2 pi) makes a ring, the last bullet isn't put on top of the first one
+        self.count = count
+        self.spread = spread
+        # Aimed shots are centred on the direction of the player (as found by the World's aim system),
+        # the others on straight down, angle turns the centre further (in radians, clockwise on screen)
+        self.aimed = aimed
+        self.angle = angle
+        # Radians the pattern turns after every shot, for spirals and rotating emitters
+        self.spin = spin
+        # Volleys fired per shot, delay frames apart, for bursts
+        self.volleys = volleys
+        self.delay = delay
+        # Whether the bullets leave from the middle of the plane instead of its top left corner
+        self.from_centre = from_centre
+        # Whether the directions are stretched out to the edge of a square instead of a circle, a diagonal
+        # bullet then moves bullet speed pixels along both axes like the original super bombardier's
+        # (1, 1) shots instead of bullet speed pixels in all
+        self.square = square
+        # Sprite of the bullets in image bank 0
+        self.u = u
+        self.v = v
+
+        # Angles of the bullets of one volley around the centre of the shot
+        if count == 1:
+            self.offsets = np.zeros(1)
+        elif spread >= 2 * np.pi:
+            self.offsets = np.arange(count) * (2 * np.pi / count)
+        else:
+            self.offsets = np.linspace(-spread / 2, spread / 2, count)
+
+        self.id = len(PATTERN_LIST)
+        PATTERN_LIST.append(self)
+        PATTERNS[name] = self
+
+    def firing(self, frame_count, shoot_speed):
+        # Returns which of the planes (given by their shoot speed array) fire a volley on this frame
+        # Volley k of a shot comes k * delay frames after the shot
+        fire = frame_count % shoot_speed == 0
+        for k in range(1, self.volleys):
+            fire |= (frame_count - k * self.delay) % shoot_speed == 0
+        return fire
+
+    def emit(self, x, y, width, height, aim_x, aim_y, shoot_speed, frame_count):
+        # Works out the bullets fired by planes at x, y (arrays, one per firing plane)
+        # Returns the x, y and direction x, direction y arrays of every bullet, the bullets of the
+        # first plane first, count bullets per plane
+        if self.from_centre:
+            x = x + width / 2
+            y = y + height / 2
+
+        # Shots fired so far, which sets how far a spinning pattern has turned
+        shots = frame_count // shoot_speed
+        turn = self.angle + self.spin * shots
+        # Every bullet's turn from the centre of the shot, one row per plane
+        angles = turn[:, None] + self.offsets[None, :]
+        cos = np.cos(angles)
+        sin = np.sin(angles)
+
+        if self.aimed:
+            # The aim vector is turned, so a single aimed bullet goes exactly where the aim points
+            base_x = aim_x[:, None]
+            base_y = aim_y[:, None]
+        else:
+            # Straight down
+            base_x = np.zeros((len(x), 1))
+            base_y = np.ones((len(x), 1))
+        direction_x = base_x * cos - base_y * sin
+        direction_y = base_x * sin + base_y * cos
+        if self.square:
+            # Rounded so the 8 directions come out as exact -1, 0 and 1
+            longest = np.maximum(np.abs(direction_x), np.abs(direction_y))
+            direction_x = np.round(direction_x / longest, 12)
+            direction_y = np.round(direction_y / longest, 12)
+
+        return (
+            np.repeat(x, self.count),
+            np.repeat(y, self.count),
+            direction_x.ravel(),
+            direction_y.ravel(),
+        )
+
+
+# Every pattern, the World stores the index of a plane's pattern in this list
+PATTERN_LIST = []
+# Every pattern by name
+PATTERNS = {}
+
+
+# A single bullet at the player, what most planes fire
+BulletPattern("aimed")
+# A bullet in all 8 directions at once from the middle of the plane (the super bombardier's burst)
+BulletPattern("ring8", count=8, spread=2 * np.pi, aimed=False, from_centre=True, square=True)
+# Three bullets fanned out towards the player
+BulletPattern("aimed_spread3", count=3, spread=np.pi / 6)
+# Three aimed bullets in quick succession
+BulletPattern("burst3", volleys=3, delay=4)
+# A ring which turns a little every shot, fired often it draws a spiral
+BulletPattern("spiral", count=6, spread=2 * np.pi, aimed=False, spin=0.2, from_centre=True)
+# Four bullets in a cross which turns an eighth of a turn every shot
+BulletPattern("rotating_cross", count=4, spread=2 * np.pi, aimed=False, spin=np.pi / 4, from_centre=True)
+# A big ring of 32 bullets, the bullet hell classic
+BulletPattern("ring32", count=32, spread=2 * np.pi, aimed=False, from_centre=True)
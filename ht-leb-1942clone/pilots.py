@@ -0,0 +1,108 @@
+import numpy as np
+import pyxel
+
+# This file holds the scripted pilots which fly the plane instead of a player
+# A pilot looks at the game every frame and returns the keys it would be holding down
+# It flies the plane of one player, the first one unless told otherwise (e.g. a bot in a co-op game)
+# They are used to drive headless games, e.g. by the batch simulator in batch.py
+
+
+class Pilot:
+    # Parent class for all pilots, this one never touches the controls
+    def __init__(self, rng, player=0):
+        # Random number generator of the pilot, seeded with the game so runs can be repeated
+        self.rng = rng
+        # Number of the player whose plane the pilot flies (0 unless in a co-op game)
+        self.player = player
+
+    def keys(self, game):
+        # Returns the set of keys held down on this frame
+        return set()
+
+    def plane(self, game):
+        # The plane the pilot flies
+        return game.planes[self.player]
+
+    def fire(self, game):
+        # Tapping the fire key every other frame, as a held key only counts as one press
+        if game.frame_count % 2 == 0:
+            return {pyxel.KEY_X}
+        return set()
+
+
+class IdlePilot(Pilot):
+    # Stays where it starts and keeps firing
+    def keys(self, game):
+        return self.fire(game)
+
+
+class RandomPilot(Pilot):
+    # Mashes random movement keys, keeping each choice for a few frames, and keeps firing
+    def __init__(self, rng, player=0):
+        super().__init__(rng, player)
+        self.held = set()
+
+    def keys(self, game):
+        if game.frame_count % 8 == 0:
+            moves = [pyxel.KEY_LEFT, pyxel.KEY_RIGHT, pyxel.KEY_UP, pyxel.KEY_DOWN]
+            self.held = {key for key in moves if self.rng.random() < 0.3}
+        return self.held | self.fire(game)
+
+
+class SweepPilot(Pilot):
+    # Sweeps from one side of the screen to the other and keeps firing
+    def __init__(self, rng, player=0):
+        super().__init__(rng, player)
+        self.direction = pyxel.KEY_LEFT if rng.random() < 0.5 else pyxel.KEY_RIGHT
+
+    def keys(self, game):
+        plane = self.plane(game)
+        # Turns around at the edges of the screen
+        if plane.x - plane.speed < 0:
+            self.direction = pyxel.KEY_RIGHT
+        elif plane.x + plane.speed > pyxel.width - plane.width:
+            self.direction = pyxel.KEY_LEFT
+        return {self.direction} | self.fire(game)
+
+
+class DodgePilot(Pilot):
+    # Lines up under the closest enemy to shoot it and flips when enemy bullets get close
+    def __init__(self, rng, player=0, danger_radius=24):
+        super().__init__(rng, player)
+        # Distance from the plane at which an enemy bullet triggers a flip
+        self.danger_radius = danger_radius
+
+    def keys(self, game):
+        plane = self.plane(game)
+        keys = self.fire(game)
+
+        world = game.world
+        n = len(world)
+
+        # Moves sideways towards the centre of the closest enemy
+        centre_x = plane.x + plane.width / 2
+        if n:
+            enemy_centres = world.x[:n] + world.width[:n] / 2
+            target_x = enemy_centres[np.abs(enemy_centres - centre_x).argmin()]
+            if target_x < centre_x - plane.speed:
+                keys.add(pyxel.KEY_LEFT)
+            elif target_x > centre_x + plane.speed:
+                keys.add(pyxel.KEY_RIGHT)
+
+        # Flips (the plane can't be hit while flipping) if any enemy bullet is too close
+        if plane.flipping == 0 and plane.flips > 0 and game.frame_count % 2 == 1:
+            centre_y = plane.y + plane.height / 2
+            bullets = game.enemy_bullets
+            n = bullets.count
+            if n and (((bullets.x[:n] - centre_x) ** 2 + (bullets.y[:n] - centre_y) ** 2) < self.danger_radius ** 2).any():
+                keys.add(pyxel.KEY_Z)
+        return keys
+
+
+# Pilots by name, so they can be picked from the command line and sent to other processes
+PILOTS = {
+    "idle": IdlePilot,
+    "random": RandomPilot,
+    "sweep": SweepPilot,
+    "dodge": DodgePilot,
+}
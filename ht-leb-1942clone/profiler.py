@@ -0,0 +1,116 @@
+import csv
+import os
+from time import perf_counter
+import numpy as np
+import pyxel
+
+# This file holds the frame time profiler
+# Every stage of a frame (background, collisions, drawing, ...) has its own fixed size ring buffer
+# holding how long that stage took over the last frames, in milliseconds
+# The game shows the p50 and p99 of each stage in an overlay and can dump the buffers to a CSV file
+#
+# Timing a stage costs one perf_counter call, stages are chained like laps of a stopwatch:
+#     t = profiler.start()
+#     ...background...
+#     t = profiler.record("background", t)
+#     ...collisions...
+#     t = profiler.record("collisions", t)
+
+
+class RingBuffer:
+    # Fixed size buffer of floats, once full the oldest values are overwritten
+    def __init__(self, size):
+        self.values = np.zeros(size)
+        # Next slot to be written and number of slots written so far (at most size)
+        self.index = 0
+        self.filled = 0
+
+    def append(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        self.filled = min(self.filled + 1, len(self.values))
+
+    def ordered(self):
+        # Returns the stored values from oldest to newest
+        if self.filled < len(self.values):
+            return self.values[:self.filled]
+        return np.concatenate((self.values[self.index:], self.values[:self.index]))
+
+
+class FrameProfiler:
+    # Collects per stage frame times in ring buffers
+    def __init__(self, size=600, enabled=True):
+        # Number of frames remembered per stage
+        self.size = size
+        # A disabled profiler records nothing, for headless games run in bulk where every microsecond counts
+        self.enabled = enabled
+        # Ring buffer of every stage, by name, in the order the stages were first seen
+        self.stages = {}
+
+        # Whether the overlay is shown
+        self.overlay = False
+        # Percentiles shown by the overlay, only worked out every few frames as it is not free
+        self.summary = []
+        self.summary_age = 0
+        # Line shown under the overlay for a few drawn frames after the timings were saved, e.g. the file name
+        self.notice = ""
+        self.notice_age = 0
+
+    def start(self):
+        # Returns the time the next stage starts at
+        return perf_counter()
+
+    def record(self, stage, start):
+        # Stores how long the stage took since start (in ms) and returns the time it ended,
+        # which is where the next stage starts
+        if not self.enabled:
+            return start
+        now = perf_counter()
+        buffer = self.stages.get(stage)
+        if buffer is None:
+            buffer = self.stages[stage] = RingBuffer(self.size)
+        buffer.append((now - start) * 1000)
+        return now
+
+    def percentiles(self):
+        # Returns (stage, p50, p99) for every stage, in ms
+        result = []
+        for stage, buffer in self.stages.items():
+            values = buffer.ordered()
+            if len(values):
+                p50, p99 = np.percentile(values, [50, 99])
+                result.append((stage, p50, p99))
+        return result
+
+    def export_csv(self, path):
+        # Writes every stored sample to a CSV file, one row per stage and frame (oldest first)
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["stage", "sample", "ms"])
+            for stage, buffer in self.stages.items():
+                for sample, value in enumerate(buffer.ordered().tolist()):
+                    writer.writerow([stage, sample, f"{value:.4f}"])
+        self.notice = f"SAVED {os.path.basename(path)}"
+        self.notice_age = 120
+
+    def draw_overlay(self, x=0, y=10):
+        # Draws the p50 and p99 of every stage as text, the numbers are refreshed every 30 drawn frames
+        if self.summary_age <= 0:
+            self.summary = self.percentiles()
+            self.summary_age = 30
+        self.summary_age -= 1
+
+        pyxel.rect(x, y, 120, 8 + 7 * len(self.summary), 0)
+        pyxel.text(x + 1, y + 1, "STAGE          P50    P99", 10)
+        for i, (stage, p50, p99) in enumerate(self.summary):
+            pyxel.text(x + 1, y + 8 + 7 * i, f"{stage[:13]:<13}{p50:6.2f}{p99:7.2f}", 7)
+
+    def draw_notice(self, x=0, y=10):
+        # Draws the notice (if any) where the overlay is drawn, or just under it when the overlay is shown
+        if self.notice_age <= 0:
+            return
+        self.notice_age -= 1
+        if self.overlay:
+            y += 8 + 7 * len(self.summary)
+        pyxel.rect(x, y, 4 * len(self.notice) + 2, 7, 0)
+        pyxel.text(x + 1, y + 1, self.notice, 10)
@@ -0,0 +1,110 @@
+import struct
+import zlib
+from array import array
+import pyxel
+
+# This file records the keys pressed on every frame of a game so the exact same game can be played again
+# Together with the seed of the game's random number generator this is all that is needed to rerun
+# a session frame by frame, e.g. to benchmark and profile the same load over and over
+# Every frame takes 2 bytes: one bit per key for "held" and one bit per key for "just pressed"
+# and the frames are zlib compressed in the file, as most frames repeat the one before
+
+# Keys the game reacts to, the position in the list is the bit used for that key
+RECORDED_KEYS = [
+    pyxel.KEY_LEFT,
+    pyxel.KEY_RIGHT,
+    pyxel.KEY_UP,
+    pyxel.KEY_DOWN,
+    pyxel.KEY_X,
+    pyxel.KEY_Z,
+    pyxel.KEY_RETURN,
+]
+
+# The pressed bits sit above the held bits
+PRESSED_SHIFT = len(RECORDED_KEYS)
+
+# Start of every recording file, followed by the seed and the number of frames
+MAGIC = b"1942REC1"
+HEADER = struct.Struct("<8sQI")
+
+
+class Recording:
+    # Seed of a game and the keys of every frame played
+    def __init__(self, seed, frames=None):
+        self.seed = seed
+        # One 16 bit number per frame holding the held and pressed bits
+        self.frames = frames if frames is not None else array("H")
+
+    def __len__(self):
+        return len(self.frames)
+
+    def save(self, path):
+        # Writes the recording to a file
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, self.seed, len(self.frames)))
+            file.write(zlib.compress(self.frames.tobytes()))
+
+    @staticmethod
+    def load(path):
+        # Reads a recording written by save()
+        with open(path, "rb") as file:
+            magic, seed, length = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a recording")
+            frames = array("H")
+            frames.frombytes(zlib.decompress(file.read()))
+            if len(frames) != length:
+                raise ValueError(f"{path} is truncated")
+        return Recording(seed, frames)
+
+
+class InputRecorder:
+    # Wraps the controls the game is played with and writes down their state on every frame
+    def __init__(self, source, seed):
+        self.source = source
+        self.recording = Recording(seed)
+
+    def btn(self, key):
+        return self.source.btn(key)
+
+    def btnp(self, key):
+        return self.source.btnp(key)
+
+    def next_frame(self, keys=()):
+        # Moves the wrapped controls on and records the state of every key for this frame
+        self.source.next_frame(keys)
+        bits = 0
+        for bit, key in enumerate(RECORDED_KEYS):
+            if self.source.btn(key):
+                bits |= 1 << bit
+            if self.source.btnp(key):
+                bits |= 1 << (bit + PRESSED_SHIFT)
+        self.recording.frames.append(bits)
+
+
+class ReplayControls:
+    # Plays back the keys of a recording, one frame at a time
+    def __init__(self, recording):
+        self.recording = recording
+        # Index of the next frame to be played, the bits of the current one
+        self.position = 0
+        self.bits = 0
+
+    def finished(self):
+        # True once every recorded frame has been played
+        return self.position >= len(self.recording)
+
+    def btn(self, key):
+        return bool(self.bits & (1 << RECORDED_KEYS.index(key)))
+
+    def btnp(self, key):
+        return bool(self.bits & (1 << (RECORDED_KEYS.index(key) + PRESSED_SHIFT)))
+
+    def next_frame(self, keys=()):
+        # Moves on to the next recorded frame, keys are ignored as they come from the recording
+        # After the end of the recording no keys are pressed
+        if self.finished():
+            self.bits = 0
+        else:
+            self.bits = self.recording.frames[self.position]
+            self.position += 1
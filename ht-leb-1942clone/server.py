@@ -0,0 +1,386 @@
+import argparse
+import asyncio
+import json
+import struct
+import zlib
+from random import Random
+from time import perf_counter
+import pyxel
+from game_manager import GameManager
+from pilots import PILOTS
+from replay import RECORDED_KEYS
+from snapshot import snapshot, restore, encode_delta, decode_delta
+from config import SERVER_TICK_RATE, SERVER_SNAPSHOT_INTERVAL
+
+# This is the co-op server, several players flying in the same game over local sockets
+# The server runs the only real game (headless, one plane per player) at a fixed tick rate, so it is the
+# authority on everything that happens; clients only send the keys they hold and get the state back
+# The state is sent as the snapshots of snapshot.py: a whole one when a client joins and after that only
+# the delta from the last one the client got, which is a few hundred bytes as little changes between two
+# TCP keeps the messages in order, so the client always has the snapshot a delta was taken from
+#
+#     python server.py --port 4242              runs a server for 2 players until stopped
+#     python server.py --loopback --seconds 5   runs a server and bot clients on this machine and prints
+#                                               the bandwidth and tick cost of every client
+#
+# Every message is a header (type and length of the payload) followed by the payload
+MESSAGE = struct.Struct("<BI")
+
+# Messages sent by the clients
+# Asks for a plane, no payload
+JOIN = 1
+# The keys the player holds from now on, one bit per key of RECORDED_KEYS
+INPUT = 2
+
+# Messages sent by the server
+# Answer to JOIN: the player number given to the client (or 255 when the game is full), the number of
+# players and the tick rate
+WELCOME = 3
+# A whole snapshot, or a delta from the last snapshot sent, both after a SNAPSHOT_HEADER
+SNAPSHOT_FULL = 4
+SNAPSHOT_DELTA = 5
+
+WELCOME_PAYLOAD = struct.Struct("<BBH")
+INPUT_PAYLOAD = struct.Struct("<H")
+# Tick of the snapshot and the crc32 of the whole snapshot, so the client can check what it decoded
+SNAPSHOT_HEADER = struct.Struct("<QI")
+
+# Player number sent when there is no plane left
+GAME_FULL = 255
+
+
+def keys_to_bits(keys):
+    # Packs a set of keys into one bit per key of RECORDED_KEYS
+    bits = 0
+    for bit, key in enumerate(RECORDED_KEYS):
+        if key in keys:
+            bits |= 1 << bit
+    return bits
+
+
+def bits_to_keys(bits):
+    # Unpacks the bits made by keys_to_bits()
+    return frozenset(key for bit, key in enumerate(RECORDED_KEYS) if bits & (1 << bit))
+
+
+def pack_message(kind, payload=b""):
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader):
+    # Waits for the next message and returns its type and payload
+    kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    return kind, await reader.readexactly(length)
+
+
+class Connection:
+    # A client of the server and what has been sent to it
+    def __init__(self, player, writer):
+        self.player = player
+        self.writer = writer
+        # Last snapshot sent, the next delta is taken from it
+        self.last = None
+
+        # Statistics
+        self.bytes_sent = 0
+        self.snapshots = 0
+        self.keyframes = 0
+        # Time spent encoding and sending this client's snapshots
+        self.send_time = 0.0
+
+    def stats(self, seconds):
+        return {
+            "player": self.player,
+            "snapshots": self.snapshots,
+            "keyframes": self.keyframes,
+            "bytes_sent": self.bytes_sent,
+            "bytes_per_snapshot": self.bytes_sent / self.snapshots if self.snapshots else 0,
+            "kilobytes_per_second": self.bytes_sent / 1024 / seconds if seconds > 0 else 0,
+            "send_ms_per_snapshot": self.send_time * 1000 / self.snapshots if self.snapshots else 0,
+        }
+
+
+class GameServer:
+    # Runs a co-op game for the given number of players and serves it to the clients
+    def __init__(self, players=2, tick_rate=SERVER_TICK_RATE, snapshot_interval=SERVER_SNAPSHOT_INTERVAL,
+                 seed=None, width=256, height=256):
+        self.game = GameManager(width, height, headless=True, seed=seed, players=players)
+        self.players = players
+        self.tick_rate = tick_rate
+        # A snapshot is sent every snapshot_interval ticks
+        self.snapshot_interval = snapshot_interval
+        # Keys held by every player, a player without a client holds none
+        self.held = [frozenset()] * players
+        # Connection of every player, None while the plane is free
+        self.connections = [None] * players
+        # Every connection the server has had, for the statistics
+        self.served = []
+        self.server = None
+
+        # Statistics
+        self.ticks = 0
+        self.tick_time = 0.0
+        self.max_tick_time = 0.0
+        self.snapshot_time = 0.0
+        self.broadcasts = 0
+        self.started = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        # Starts listening for clients, port 0 picks a free port, returns the port
+        self.server = await asyncio.start_server(self.serve, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        # Disconnects every client and stops listening
+        for connection in self.connections:
+            if connection is not None:
+                connection.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def serve(self, reader, writer):
+        # Talks to one client: gives it a plane and then reads its keys until it leaves
+        try:
+            kind, payload = await read_message(reader)
+            if kind != JOIN or None not in self.connections:
+                writer.write(pack_message(WELCOME, WELCOME_PAYLOAD.pack(GAME_FULL, self.players, self.tick_rate)))
+                writer.close()
+                return
+            player = self.connections.index(None)
+            connection = Connection(player, writer)
+            self.connections[player] = connection
+            self.served.append(connection)
+            writer.write(pack_message(WELCOME, WELCOME_PAYLOAD.pack(player, self.players, self.tick_rate)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == INPUT:
+                    bits, = INPUT_PAYLOAD.unpack(payload)
+                    self.held[player] = bits_to_keys(bits)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # The plane is free again and stops moving
+            self.connections[player] = None
+            self.held[player] = frozenset()
+            writer.close()
+
+    def tick(self):
+        # Runs one frame of the game with the keys every player holds and sends the snapshots when due
+        start = perf_counter()
+        self.game.tick(self.held[0], self.held[1:])
+        elapsed = perf_counter() - start
+        self.tick_time += elapsed
+        self.max_tick_time = max(self.max_tick_time, elapsed)
+        self.ticks += 1
+        if self.ticks % self.snapshot_interval == 0:
+            self.broadcast()
+
+    def broadcast(self):
+        # Sends the state of the game to every client, a delta from the one it got last
+        # Clients which got the same snapshot last share the encoded delta
+        start = perf_counter()
+        data = snapshot(self.game)
+        header = SNAPSHOT_HEADER.pack(self.game.frame_count, zlib.crc32(data))
+        self.snapshot_time += perf_counter() - start
+        self.broadcasts += 1
+        encoded = {}
+        for connection in self.connections:
+            if connection is None:
+                continue
+            start = perf_counter()
+            if connection.last is None:
+                message = pack_message(SNAPSHOT_FULL, header + data)
+                connection.keyframes += 1
+            else:
+                key = id(connection.last)
+                if key not in encoded:
+                    encoded[key] = pack_message(SNAPSHOT_DELTA, header + encode_delta(connection.last, data))
+                message = encoded[key]
+            # Written without waiting, a slow client must not hold up the game
+            connection.writer.write(message)
+            connection.last = data
+            connection.bytes_sent += len(message)
+            connection.snapshots += 1
+            connection.send_time += perf_counter() - start
+
+    async def run(self, seconds=None):
+        # Runs the game at the tick rate, for the given number of seconds or until cancelled
+        # When a tick runs late the next ones are run straight away to catch up
+        loop = asyncio.get_running_loop()
+        period = 1 / self.tick_rate
+        self.started = loop.time()
+        next_tick = self.started
+        while seconds is None or next_tick - self.started < seconds:
+            self.tick()
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    def stats(self):
+        # Returns the cost of the ticks and the traffic of every client as a dictionary
+        seconds = asyncio.get_running_loop().time() - self.started if self.started is not None else 0
+        return {
+            "players": self.players,
+            "tick_rate": self.tick_rate,
+            "ticks": self.ticks,
+            "tick_ms": self.tick_time * 1000 / self.ticks if self.ticks else 0,
+            "max_tick_ms": self.max_tick_time * 1000,
+            "snapshot_ms": self.snapshot_time * 1000 / self.broadcasts if self.broadcasts else 0,
+            "clients": [connection.stats(seconds) for connection in self.served],
+        }
+
+
+class GameClient:
+    # Joins a server, sends the keys of its player and keeps the last state of the game it was sent
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.player = None
+        self.players = None
+        self.tick_rate = None
+        # Last snapshot received (bytes, see snapshot.py) and its tick
+        self.state = None
+        self.tick = None
+        # Keys last sent, the server is only told when they change
+        self.held = None
+
+        # Statistics
+        self.bytes_received = 0
+        self.snapshots = 0
+        # Snapshots whose crc32 didn't match once decoded
+        self.mismatches = 0
+
+    async def connect(self, host, port):
+        # Joins the game, returns the player number or raises ConnectionError when the game is full
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(pack_message(JOIN))
+        kind, payload = await read_message(self.reader)
+        self.player, self.players, self.tick_rate = WELCOME_PAYLOAD.unpack(payload)
+        if self.player == GAME_FULL:
+            self.writer.close()
+            raise ConnectionError("the game is full")
+        return self.player
+
+    def send_keys(self, keys):
+        # Tells the server which keys the player holds
+        bits = keys_to_bits(keys)
+        if bits != self.held:
+            self.writer.write(pack_message(INPUT, INPUT_PAYLOAD.pack(bits)))
+            self.held = bits
+
+    async def receive(self):
+        # Keeps the state up to date with the snapshots of the server until the connection is closed
+        try:
+            while True:
+                kind, payload = await read_message(self.reader)
+                self.bytes_received += MESSAGE.size + len(payload)
+                tick, crc = SNAPSHOT_HEADER.unpack_from(payload)
+                body = payload[SNAPSHOT_HEADER.size:]
+                if kind == SNAPSHOT_FULL:
+                    self.state = body
+                elif kind == SNAPSHOT_DELTA:
+                    self.state = decode_delta(self.state, body)
+                else:
+                    continue
+                self.tick = tick
+                self.snapshots += 1
+                if zlib.crc32(self.state) != crc:
+                    self.mismatches += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def apply(self, game):
+        # Puts a local game (with as many players) in the last state received, e.g. to draw it
+        restore(game, self.state)
+
+    def close(self):
+        self.writer.close()
+
+    def stats(self):
+        return {
+            "player": self.player,
+            "snapshots": self.snapshots,
+            "bytes_received": self.bytes_received,
+            "mismatches": self.mismatches,
+        }
+
+
+async def run_bot(client, host, port, seconds, pilot_name):
+    # A client flown by a scripted pilot, looking at its own copy of the game built from the snapshots
+    await client.connect(host, port)
+    game = GameManager(256, 256, headless=True, players=client.players)
+    # The pilot flies the plane of the player the server gave this client
+    pilot = PILOTS[pilot_name](Random(client.player), client.player)
+    receiving = asyncio.create_task(client.receive())
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    step = 0
+    while loop.time() < end:
+        if client.state is not None:
+            client.apply(game)
+            # The snapshots don't come every tick, so the bot taps its keys on its own clock:
+            # fire (or enter, which starts and restarts the game) is held every other step
+            tap = step % 2 == 0
+            if game.scene == "PLAY":
+                keys = pilot.keys(game) - {pyxel.KEY_X}
+                if tap:
+                    keys.add(pyxel.KEY_X)
+            else:
+                keys = {pyxel.KEY_RETURN} if tap else set()
+            client.send_keys(keys)
+        step += 1
+        await asyncio.sleep(1 / client.tick_rate)
+    client.close()
+    await receiving
+
+
+async def run_loopback(players, seconds, tick_rate, snapshot_interval, pilot_name, seed):
+    # Runs a server and one bot client per player on this machine and returns the statistics of all of them
+    server = GameServer(players, tick_rate, snapshot_interval, seed)
+    port = await server.start()
+    clients = [GameClient() for i in range(players)]
+    bots = [asyncio.create_task(run_bot(client, "127.0.0.1", port, seconds, pilot_name)) for client in clients]
+    await server.run(seconds)
+    stats = server.stats()
+    await asyncio.gather(*bots)
+    await server.stop()
+    stats["client_side"] = [client.stats() for client in clients]
+    stats["score"] = server.game.score
+    stats["scene"] = server.game.scene
+    return stats
+
+
+async def run_server(players, host, port, tick_rate, snapshot_interval, seed):
+    # Serves a game until the program is stopped
+    server = GameServer(players, tick_rate, snapshot_interval, seed)
+    port = await server.start(host, port)
+    print(f"serving a {players} player game on {host}:{port}")
+    await server.run()
+
+
+# "python server.py --loopback" plays a co-op game between bot clients over loopback and prints the
+# bandwidth used by every client and the time the server spends per tick
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Co-op server")
+    parser.add_argument("--players", type=int, default=2, help="number of planes in the game")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4242)
+    parser.add_argument("--tick-rate", type=int, default=SERVER_TICK_RATE, help="game updates per second")
+    parser.add_argument("--snapshot-interval", type=int, default=SERVER_SNAPSHOT_INTERVAL,
+                        help="ticks between two snapshots sent to the clients")
+    parser.add_argument("--seed", type=int, help="seed of the game")
+    parser.add_argument("--loopback", action="store_true", help="run bot clients on this machine and print statistics")
+    parser.add_argument("--seconds", type=float, default=5, help="length of the loopback run")
+    parser.add_argument("--pilot", choices=sorted(PILOTS), default="random", help="pilot flying the bot clients")
+    args = parser.parse_args()
+
+    if args.loopback:
+        stats = asyncio.run(run_loopback(args.players, args.seconds, args.tick_rate, args.snapshot_interval,
+                                         args.pilot, args.seed))
+        print(json.dumps(stats, indent=2))
+    else:
+        asyncio.run(run_server(args.players, args.host, args.port, args.tick_rate, args.snapshot_interval, args.seed))
@@ -0,0 +1,303 @@
+import heapq
+import struct
+import zlib
+from array import array
+from collections import deque
+import numpy as np
+from world import World
+from config import REWIND_FRAMES, REWIND_KEYFRAME_INTERVAL
+
+# This file saves the whole state of a game into one compact bytes object and puts it back exactly
+# Everything that changes while playing is in it: the scene, score and lives, the random number generators,
+# the players' planes, every enemy plane (of the current wave and of the one being built ahead of time),
+# the spawn events of the wave still to come,
+# every bullet, explosion and piece of debris and the scrolling background
+# The stores keep their objects in numpy arrays, so each array is copied in or out in one go
+# and a snapshot costs a few tens of microseconds even with thousands of bullets
+#
+# The input source (keyboard, scripted keys or a replay) and the statistics of the pools and the profiler
+# are not part of the game and are left alone
+#
+# A RewindBuffer keeps a snapshot of each of the last few seconds of frames, so the game can step back in time
+
+# Start of every snapshot
+MAGIC = b"1942SNP1"
+
+# Scenes by number
+SCENES = ["TITLE", "PLAY", "GAME_OVER", "WIN"]
+
+# The game's own numbers: frame count, scene, wave, score, lives, total lives, waves cleared, lives lost, bonus
+GAME_STATE = struct.Struct("<QBBqiiQQ?")
+# Python's random number generator: its 624 words, the position in them and the saved gauss value
+RANDOM_STATE = struct.Struct("<?d")
+# The numpy generator of the debris (PCG64): its state and increment (128 bits each) and cached 32 bits
+NUMPY_STATE = struct.Struct("<16s16siI")
+# A player's plane: position, last move, double bullet powerup and timeout, alive, flipping, flips left, flipping time
+PLANE_STATE = struct.Struct("<dddd?i?iii")
+# The cluster handler's position and size of the clusters
+CLUSTER_STATE = struct.Struct("<iii")
+# The background objects (moon, planet and galaxy), each an x, y and speed
+BACKGROUND_STATE = struct.Struct("<9i")
+# The clock of the current wave and the number of its spawn events still queued (followed by their numbers)
+SCHEDULE_STATE = struct.Struct("<QI")
+# The wave being built ahead of time: its number, the event being built, the planes in the world when
+# that event started, whether the wave is finished and whether the event has been laid out
+BUILD_STATE = struct.Struct("<HII??")
+# Layout of a formation: x and y of its leader and the number of followers (followed by their offsets)
+LAYOUT_STATE = struct.Struct("<ddI")
+# Number of objects in a store, and of a world's next formation number
+COUNT = struct.Struct("<I")
+
+
+class Writer:
+    # Collects the pieces of a snapshot, joined together once at the end
+    def __init__(self):
+        self.parts = [MAGIC]
+
+    def pack(self, layout, *values):
+        self.parts.append(layout.pack(*values))
+
+    def raw(self, data):
+        self.parts.append(data)
+
+    def store(self, store):
+        # Writes the objects of a store (bullets, world, explosions...), array by array
+        count = store.count
+        self.parts.append(COUNT.pack(count))
+        for values in store.arrays():
+            self.parts.append(values[:count].tobytes())
+
+    def getvalue(self):
+        return b"".join(self.parts)
+
+
+class Reader:
+    # Reads the pieces of a snapshot back in the order they were written
+    def __init__(self, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a game snapshot")
+        self.data = data
+        self.offset = len(MAGIC)
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def raw(self, size):
+        data = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+    def store(self, store):
+        # Fills a store with the objects written by Writer.store(), growing its arrays when needed
+        count, = self.unpack(COUNT)
+        store.count = 0
+        store.reserve(count)
+        for values in store.arrays():
+            size = count * values.itemsize
+            values[:count] = np.frombuffer(self.data, values.dtype, count, self.offset)
+            self.offset += size
+        store.count = count
+
+
+def snapshot(game):
+    # Returns the state of the game as bytes
+    out = Writer()
+    out.pack(GAME_STATE, game.frame_count, SCENES.index(game.scene), game.wave, game.score, game.lives,
+             game.total_lives, game.waves_cleared, game.lives_lost, game.bonus)
+
+    version, words, gauss = game.rng.getstate()
+    out.raw(array("I", words).tobytes())
+    out.pack(RANDOM_STATE, gauss is not None, gauss or 0.0)
+
+    state = game.debris.rng.bit_generator.state
+    out.pack(NUMPY_STATE, state["state"]["state"].to_bytes(16, "little"), state["state"]["inc"].to_bytes(16, "little"),
+             state["has_uint32"], state["uinteger"])
+
+    out.pack(COUNT, len(game.planes))
+    for plane in game.planes:
+        out.pack(PLANE_STATE, plane.x, plane.y, plane.vx, plane.vy, plane.double_bullet, plane.double_bullet_timeout,
+                 plane.alive, plane.flipping, plane.flips, plane.flipping_time)
+
+    cluster = game.cluster
+    out.pack(CLUSTER_STATE, cluster.cluster_x, cluster.cluster_y, cluster.cluster_size)
+
+    background = game.background
+    moon, planet, galaxy = background.objects
+    out.pack(BACKGROUND_STATE, *moon, *planet, *galaxy,
+             background.moon_speed, background.planet_speed, background.galaxy_speed)
+    out.raw(background.layer_offsets.tobytes())
+
+    out.pack(COUNT, game.world.next_formation)
+    out.store(game.world)
+    out.pack(SCHEDULE_STATE, game.wave_frame, len(game.schedule))
+    out.raw(array("I", [number for frame, number in game.schedule]).tobytes())
+
+    # The next wave, finished or as far as it has got
+    layout = game.next_layout
+    out.pack(BUILD_STATE, game.next_wave_number, game.next_event, game.next_event_start,
+             game.next_world is not None, layout is not None)
+    if layout is not None:
+        x, y, offsets = layout
+        out.pack(LAYOUT_STATE, x, y, len(offsets))
+        out.raw(np.array(offsets, dtype=np.float64).tobytes())
+    out.pack(COUNT, game.next_build.next_formation)
+    out.store(game.next_build)
+
+    out.store(game.player_bullets)
+    out.store(game.enemy_bullets)
+    out.store(game.explosions)
+    out.store(game.debris)
+    return out.getvalue()
+
+
+def restore(game, data):
+    # Puts the game back in the state saved by snapshot()
+    read = Reader(data)
+    (game.frame_count, scene, game.wave, game.score, game.lives, game.total_lives,
+     game.waves_cleared, game.lives_lost, game.bonus) = read.unpack(GAME_STATE)
+    game.scene = SCENES[scene]
+
+    words = array("I")
+    words.frombytes(read.raw(625 * words.itemsize))
+    has_gauss, gauss = read.unpack(RANDOM_STATE)
+    game.rng.setstate((3, tuple(words), gauss if has_gauss else None))
+
+    state, inc, has_uint32, uinteger = read.unpack(NUMPY_STATE)
+    game.debris.rng.bit_generator.state = {
+        "bit_generator": "PCG64",
+        "state": {"state": int.from_bytes(state, "little"), "inc": int.from_bytes(inc, "little")},
+        "has_uint32": has_uint32,
+        "uinteger": uinteger,
+    }
+
+    players, = read.unpack(COUNT)
+    if players != len(game.planes):
+        raise ValueError(f"snapshot of a {players} player game restored into a {len(game.planes)} player game")
+    for plane in game.planes:
+        (plane.x, plane.y, plane.vx, plane.vy, plane.double_bullet, plane.double_bullet_timeout,
+         plane.alive, plane.flipping, plane.flips, plane.flipping_time) = read.unpack(PLANE_STATE)
+
+    cluster = game.cluster
+    cluster.cluster_x, cluster.cluster_y, cluster.cluster_size = read.unpack(CLUSTER_STATE)
+
+    background = game.background
+    values = read.unpack(BACKGROUND_STATE)
+    background.objects = [list(values[0:2]), list(values[2:4]), list(values[4:6])]
+    background.moon_speed, background.planet_speed, background.galaxy_speed = values[6:9]
+    layers = len(background.layer_offsets)
+    background.layer_offsets = np.frombuffer(read.raw(layers * 8), np.float64).copy()
+
+    game.world.next_formation, = read.unpack(COUNT)
+    read.store(game.world)
+    game.wave_frame, queued = read.unpack(SCHEDULE_STATE)
+    numbers = array("I")
+    numbers.frombytes(read.raw(queued * numbers.itemsize))
+    timed = game.level[game.wave].timed
+    game.schedule = [(timed[number].frame, number) for number in numbers]
+    heapq.heapify(game.schedule)
+
+    wave, event, event_start, finished, laid_out = read.unpack(BUILD_STATE)
+    layout = None
+    if laid_out:
+        x, y, followers = read.unpack(LAYOUT_STATE)
+        offsets = np.frombuffer(read.raw(followers * 16), np.float64).reshape(-1, 2)
+        layout = (x, y, [tuple(offset) for offset in offsets.tolist()])
+    world = World(game.rng, game.enemy_bullets)
+    world.next_formation, = read.unpack(COUNT)
+    read.store(world)
+    # The builder carries on where it had got to, it is never run again once the wave is finished
+    game.next_wave = game.build_wave(wave, world, layout, event, event_start)
+    game.next_world = world if finished else None
+
+    read.store(game.player_bullets)
+    read.store(game.enemy_bullets)
+    read.store(game.explosions)
+    read.store(game.debris)
+
+
+def xor(previous, current):
+    # The bytes of current xor those of previous, the shorter one padded with zeros
+    # Bytes which didn't change come out as zeros, which compress to almost nothing
+    size = max(len(previous), len(current))
+    delta = np.zeros(size, dtype=np.uint8)
+    delta[:len(current)] = np.frombuffer(current, np.uint8)
+    delta[:len(previous)] ^= np.frombuffer(previous, np.uint8)
+    return delta
+
+
+def encode_delta(previous, current):
+    # Returns current as a delta from previous: its length followed by the compressed xor of the two
+    return COUNT.pack(len(current)) + zlib.compress(xor(previous, current).tobytes(), 1)
+
+
+def decode_delta(previous, delta):
+    # Returns the snapshot encoded by encode_delta() from the one before it
+    size, = COUNT.unpack_from(delta)
+    return xor(previous, zlib.decompress(delta[COUNT.size:]))[:size].tobytes()
+
+
+class RewindBuffer:
+    # Snapshots of the last frames of a game, so it can be taken back a few seconds
+    # Every keyframe_interval-th snapshot is kept whole (a keyframe), the ones in between only as
+    # a delta from the snapshot before them, which is mostly zeros as little changes in a frame
+    # Going back means decoding at most keyframe_interval - 1 deltas from the keyframe before
+    # The oldest frames are dropped a keyframe and its deltas at a time, so at least the given
+    # number of frames is always kept
+    def __init__(self, frames=REWIND_FRAMES, keyframe_interval=REWIND_KEYFRAME_INTERVAL):
+        self.frames = frames
+        self.keyframe_interval = keyframe_interval
+        # Groups of snapshots, each a keyframe followed by its deltas, oldest first
+        self.groups = deque()
+        # Number of snapshots kept
+        self.count = 0
+        # The last snapshot pushed, the next delta is taken from it
+        self.last = None
+
+    def __len__(self):
+        return self.count
+
+    def push(self, game):
+        # Saves the state of the game, called after every frame
+        data = snapshot(game)
+        if self.last is None or len(self.groups[-1]) == self.keyframe_interval:
+            self.groups.append([data])
+        else:
+            self.groups[-1].append(encode_delta(self.last, data))
+        self.last = data
+        self.count += 1
+        while self.count - len(self.groups[0]) >= self.frames:
+            self.count -= len(self.groups.popleft())
+
+    def rewind(self, game, frames=1):
+        # Puts the game back as it was the given number of frames before the last push
+        # (0 is the last push itself) and forgets every later frame, so playing on continues from there
+        # Returns the number of frames actually gone back, which is less when the buffer doesn't go that far
+        if self.count == 0:
+            return 0
+        frames = min(frames, self.count - 1)
+        self.count -= frames
+        # Drops the frames after the one to go back to
+        dropped = frames
+        while dropped >= len(self.groups[-1]):
+            dropped -= len(self.groups.pop())
+        group = self.groups[-1]
+        del group[len(group) - dropped:]
+
+        data = group[0]
+        for delta in group[1:]:
+            data = decode_delta(data, delta)
+        self.last = data
+        restore(game, data)
+        return frames
+
+    def clear(self):
+        # Forgets every saved frame
+        self.groups.clear()
+        self.count = 0
+        self.last = None
+
+    def nbytes(self):
+        # Memory used by the saved frames
+        return sum(len(data) for group in self.groups for data in group)
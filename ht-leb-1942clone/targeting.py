@@ -0,0 +1,58 @@
+import numpy as np
+
+# This file holds the targeting used by the enemy planes to aim at the player
+# Every aim works on whole arrays: the offsets from every shooter to the player, so the World aims all
+# its planes in one pass whatever their number
+# An aim returns the direction of the shot for every shooter, which the bullet patterns then turn and spread
+
+# Aims
+# One of the 8 directions (the sign of the offset), diagonal shots are faster than straight ones
+AIM_SIGN = 0
+# Straight at the player, in any direction, as a unit vector
+AIM_DIRECT = 1
+# Where the player will be when the bullet gets there, if the player keeps moving the same way
+AIM_LEAD = 2
+
+
+def aim_sign(dx, dy, target_vx, target_vy, speed):
+    # dx and dy are the offsets from the shooters to the player
+    return np.sign(dx), np.sign(dy)
+
+
+def aim_direct(dx, dy, target_vx, target_vy, speed):
+    length = np.hypot(dx, dy)
+    # A shooter right on top of the player fires straight down
+    still = length == 0
+    length[still] = 1
+    direction_x = dx / length
+    direction_y = dy / length
+    direction_y[still] = 1
+    return direction_x, direction_y
+
+
+def aim_lead(dx, dy, target_vx, target_vy, speed):
+    # The bullet (of the given speed, per shooter) meets the player after t frames when
+    # |offset + player velocity * t| = speed * t, a quadratic equation a t^2 + b t + c = 0
+    a = target_vx * target_vx + target_vy * target_vy - speed * speed
+    b = 2 * (dx * target_vx + dy * target_vy)
+    c = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discriminant = b * b - 4 * a * c
+        root = np.sqrt(np.maximum(discriminant, 0))
+        early = (-b - root) / (2 * a)
+        late = (-b + root) / (2 * a)
+        # The first meeting still to come
+        t = np.where((early > 0) & ((early < late) | (late <= 0)), early, late)
+        # Bullet and player as fast as each other, the equation is then b t + c = 0
+        t = np.where(a == 0, -c / b, t)
+    # When the bullet can't catch the player it is fired straight at it instead
+    t = np.where((discriminant >= 0) & np.isfinite(t) & (t > 0), t, 0)
+    return aim_direct(dx + target_vx * t, dy + target_vy * t, target_vx, target_vy, speed)
+
+
+# Aim function of every aim
+AIMS = {
+    AIM_SIGN: aim_sign,
+    AIM_DIRECT: aim_direct,
+    AIM_LEAD: aim_lead,
+}
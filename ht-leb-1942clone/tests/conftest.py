@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+import pyxel
+
+# Folder of the game, its modules sit next to each other in it and import each other by name
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+
+@pytest.fixture(scope="session")
+def screen():
+    # pyxel can only be initialised once per process, the tests that draw share it
+    pyxel.init(256, 256)
+    pyxel.load(os.path.join(HERE, "Assets", "asset.pyxres"))
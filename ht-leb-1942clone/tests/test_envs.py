@@ -0,0 +1,31 @@
+import numpy as np
+import pyxel
+from envs import VectorEnv, ACTIONS
+
+
+def test_flip_action_ends_and_uses_up_a_flip():
+    # The flip action only makes the plane invincible for the length of a flip, and it can't be repeated forever
+    env = VectorEnv(1, seed=0, frame_skip=2)
+    env.reset()
+    game = env.games[0]
+    game.world.clear()
+    game.schedule.clear()
+    plane = game.plane
+    flip = ACTIONS.index(frozenset({pyxel.KEY_Z}))
+    still = ACTIONS.index(frozenset())
+
+    env.step(np.array([flip]))
+    assert plane.flipping == 1
+    steps = 0
+    while plane.flipping == 1:
+        env.step(np.array([still]))
+        steps += 1
+        assert steps < 100
+    assert plane.flips == plane.total_flips - 1
+
+    for i in range(plane.total_flips + 2):
+        env.step(np.array([flip]))
+        for step in range(50):
+            env.step(np.array([still]))
+    assert plane.flips == 0
+    assert plane.flipping == 0
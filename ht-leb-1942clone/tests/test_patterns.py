@@ -0,0 +1,23 @@
+import numpy as np
+from patterns import PATTERNS
+
+
+def test_ring8_fires_the_super_bombardiers_8_directions():
+    # The burst replacing the super bombardier's own shooting keeps its per axis speeds, (1, 1) on the diagonals
+    x, y, direction_x, direction_y = PATTERNS["ring8"].emit(
+        np.array([10.0]), np.array([20.0]), np.array([32.0]), np.array([32.0]),
+        np.array([0.0]), np.array([1.0]), np.array([30]), 0,
+    )
+    assert set(zip(direction_x.tolist(), direction_y.tolist())) == {
+        (0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)
+    }
+    assert (x == 26).all() and (y == 36).all()
+
+
+def test_rings_are_round_unless_square():
+    # Other rings still move their bullets at the bullet speed in every direction
+    x, y, direction_x, direction_y = PATTERNS["ring32"].emit(
+        np.array([0.0]), np.array([0.0]), np.array([32.0]), np.array([32.0]),
+        np.array([0.0]), np.array([1.0]), np.array([30]), 0,
+    )
+    assert np.allclose(np.hypot(direction_x, direction_y), 1)
@@ -0,0 +1,23 @@
+from random import Random
+import pyxel
+from enemy import RegularEnemy
+from game_manager import GameManager
+from pilots import DodgePilot, SweepPilot
+
+
+def test_pilots_fly_their_own_player():
+    game = GameManager(256, 256, headless=True, seed=0, players=2)
+    game.step(1, {pyxel.KEY_RETURN})
+    game.world.clear()
+    first, second = game.planes
+    first.x = 0
+    second.x = pyxel.width - second.width
+
+    # A sweeping pilot turns around at the edge its own plane is at
+    assert pyxel.KEY_RIGHT in SweepPilot(Random(0), 0).keys(game)
+    assert pyxel.KEY_LEFT in SweepPilot(Random(0), 1).keys(game)
+
+    # A dodging pilot steers its own plane towards the enemy in the middle of the screen
+    game.world.spawn(RegularEnemy, (pyxel.width - RegularEnemy.width) / 2, 0)
+    assert pyxel.KEY_RIGHT in DodgePilot(Random(0), 0).keys(game)
+    assert pyxel.KEY_LEFT in DodgePilot(Random(0), 1).keys(game)
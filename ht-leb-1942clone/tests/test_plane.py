@@ -0,0 +1,43 @@
+import pyxel
+from game_manager import GameManager
+
+
+def new_game():
+    # Headless game on the play screen, with no enemies so nothing hits the plane
+    game = GameManager(256, 256, headless=True, seed=0)
+    game.step(1, {pyxel.KEY_RETURN})
+    game.world.clear()
+    game.schedule.clear()
+    return game
+
+
+def test_flip_ends_headless():
+    game = new_game()
+    plane = game.plane
+    game.step(1, {pyxel.KEY_Z})
+    assert plane.flipping == 1
+    flip_frames = 1
+    while plane.flipping == 1 and flip_frames < 200:
+        game.step(1)
+        flip_frames += 1
+    # Flipping on the frame Z is pressed and the 61 frames the flipping time counts down from 100 to 39
+    # (the last frame of the animation), the flip ends on the frame after that
+    assert flip_frames == 63
+    assert plane.flipping == 0
+    assert plane.flipping_time == plane.flipping_time_default
+    assert plane.flips == plane.total_flips - 1
+
+
+def test_plane_moves_and_flips_again_after_a_flip():
+    game = new_game()
+    plane = game.plane
+    game.step(1, {pyxel.KEY_Z})
+    game.step(100)
+    x = plane.x
+    game.step(3, {pyxel.KEY_LEFT})
+    assert plane.x == x - 3 * plane.speed
+    for flip in range(plane.total_flips + 1):
+        game.step(1, {pyxel.KEY_Z})
+        game.step(100)
+    assert plane.flips == 0
+    assert plane.flipping == 0
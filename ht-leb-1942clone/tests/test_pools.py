@@ -0,0 +1,70 @@
+from random import Random
+import pyxel
+from bullets import BulletStore
+from config import PLAYER_BULLET_POOL_SIZE, ENEMY_BULLET_POOL_SIZE, BLAST_POOL_SIZE, DEBRIS_POOL_SIZE
+from game_manager import GameManager
+from particles import Explosions, Debris
+from pilots import DodgePilot
+
+
+def test_bullet_slots_are_reused_without_allocating():
+    # Within their capacity the stores fire into the arrays made up front, dead bullets' slots are
+    # packed away and fired into again with every field set anew
+    bullets = BulletStore(8)
+    arrays = bullets.arrays()
+    for i in range(8):
+        bullets.spawn(10 * i, 100, direction=(1, 1), speed=2)
+    for i in range(0, 8, 2):
+        bullets.kill(i)
+    bullets.compact()
+    assert len(bullets) == 4
+    bullets.spawn_many(50, 60, 69, 101, [(0, 1)] * 4, 5)
+    assert [array is old for array, old in zip(bullets.arrays(), arrays)] == [True] * 7
+    assert bullets.x[4:8].tolist() == [50] * 4
+    assert bullets.vx[4:8].tolist() == [0] * 4
+    assert bullets.vy[4:8].tolist() == [5] * 4
+    assert bullets.alive[:8].all()
+    assert bullets.stats() == {"capacity": 8, "in_use": 8, "high_water_mark": 8, "grow_count": 0, "fired": 12}
+
+    # A fight bigger than the pool grows it instead of dropping bullets, and the stats show it
+    bullets.spawn(0, 0)
+    assert bullets.stats()["capacity"] == 16
+    assert bullets.stats()["grow_count"] == 1
+
+
+def test_particle_slots_are_reused_without_allocating():
+    # An explosion lasts 7 frames and a piece of debris at most 15, so one explosion and 4 pieces
+    # a frame stay within 8 and 64 slots
+    explosions = Explosions(8)
+    debris = Debris(Random(0), 64)
+    arrays = explosions.arrays() + debris.arrays()
+    for frame in range(100):
+        explosions.spawn(frame, frame)
+        debris.burst(frame, frame, count=4)
+        explosions.update()
+        debris.update()
+    assert [array is old for array, old in zip(explosions.arrays() + debris.arrays(), arrays)] == [True] * len(arrays)
+    assert explosions.stats()["grow_count"] == 0
+    assert debris.stats()["grow_count"] == 0
+    assert 0 < explosions.stats()["high_water_mark"] <= 8
+    assert 0 < debris.stats()["high_water_mark"] <= 64
+
+
+def test_config_pool_sizes_fit_a_game():
+    # The pool sizes in config.py hold a whole game without growing, the high water marks tell how close they came
+    game = GameManager(256, 256, headless=True, seed=1, profile=False)
+    game.step(1, {pyxel.KEY_RETURN})
+    pilot = DodgePilot(Random(1))
+    for frame in range(2000):
+        game.step(1, pilot.keys(game))
+    stats = game.pool_stats()
+    sizes = {
+        "player_bullets": PLAYER_BULLET_POOL_SIZE,
+        "enemy_bullets": ENEMY_BULLET_POOL_SIZE,
+        "blasts": BLAST_POOL_SIZE,
+        "debris": DEBRIS_POOL_SIZE,
+    }
+    for name, size in sizes.items():
+        assert stats[name]["capacity"] == size, name
+        assert stats[name]["grow_count"] == 0, name
+        assert 0 < stats[name]["high_water_mark"] <= size, name
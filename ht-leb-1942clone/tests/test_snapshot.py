@@ -0,0 +1,55 @@
+from random import Random
+import pyxel
+from game_manager import GameManager
+from pilots import DodgePilot
+from snapshot import snapshot, restore
+
+
+def play(game, pilot, frames, flip_at=None):
+    # Lets the pilot fly for frames frames, flipping on frame flip_at, and returns the keys of every frame
+    log = []
+    for frame in range(frames):
+        keys = pilot.keys(game)
+        if frame == flip_at:
+            keys.add(pyxel.KEY_Z)
+        log.append(keys)
+        game.step(1, keys)
+    return log
+
+
+def test_restored_game_carries_on_exactly():
+    # A snapshot restored into another game (other seed, further along) gives back the same bytes, and the same
+    # keys from there on lead to the same game, also when the snapshot is taken in the middle of a flip
+    game = GameManager(256, 256, headless=True, seed=2)
+    game.step(1, {pyxel.KEY_RETURN})
+    pilot = DodgePilot(Random(2))
+    play(game, pilot, 300, flip_at=290)
+    assert game.plane.flipping == 1
+    saved = snapshot(game)
+    held = game.controls.held
+    log = play(game, pilot, 400)
+    end = snapshot(game)
+
+    other = GameManager(256, 256, headless=True, seed=102)
+    other.step(50, {pyxel.KEY_RETURN})
+    restore(other, saved)
+    assert snapshot(other) == saved
+    other.controls.held = held
+    for keys in log:
+        other.step(1, keys)
+    assert snapshot(other) == end
+
+
+def test_rewind_gives_back_earlier_frames_exactly():
+    game = GameManager(256, 256, headless=True, seed=5, rewind=True)
+    game.step(1, {pyxel.KEY_RETURN})
+    pilot = DodgePilot(Random(5))
+    states = {}
+    for frame in range(200):
+        game.step(1, pilot.keys(game))
+        states[game.frame_count] = snapshot(game)
+    # Back over keyframes and the deltas between them, 141 frames in all out of the 150 the buffer keeps
+    for frames in (1, 29, 30, 31, 50):
+        rewound = game.rewind.rewind(game, frames)
+        assert rewound == frames
+        assert snapshot(game) == states[game.frame_count]
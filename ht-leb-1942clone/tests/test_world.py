@@ -0,0 +1,40 @@
+from random import Random
+from bullets import BulletStore
+from enemy import RegularEnemy, Bombardier
+from world import World
+
+
+def test_compaction_updates_every_living_plane_once(screen):
+    # Planes killed next to each other and planes leaving the screen during the update are removed in one pass,
+    # none of the planes after them misses its move and the living ones keep their order
+    world = World(Random(0), BulletStore())
+    for i in range(9):
+        world.spawn(RegularEnemy, 10 + 20 * i, 10)
+    # The last one leaves the screen on the right during this update
+    world.spawn(RegularEnemy, 256 - RegularEnemy.width, 10)
+    for i in (0, 1, 4, 5, 8):
+        world.kill(i)
+
+    world.update(1, [])
+    assert len(world) == 4
+    assert world.x[:4].tolist() == [51, 71, 131, 151]
+    assert world.y[:4].tolist() == [11] * 4
+    assert world.alive[:4].all()
+
+    world.update(2, [])
+    assert world.x[:4].tolist() == [52, 72, 132, 152]
+
+
+def test_formation_carries_on_after_losing_its_leader(screen):
+    # The first living follower takes over from a dead leader before the leader is removed,
+    # and the formation moves on together on the same frame
+    world = World(Random(0), BulletStore())
+    world.spawn_formation(Bombardier, 10, 10, [(30, 0), (60, 0), (90, 0)])
+    world.kill(0)
+    world.kill(2)
+
+    world.update(1, [])
+    assert len(world) == 2
+    assert world.leader[:2].tolist() == [True, False]
+    assert world.x[:2].tolist() == [40, 100]
+    assert world.y[:2].tolist() == [10 + Bombardier.speed] * 2
@@ -0,0 +1,146 @@
+import heapq
+import json
+import os
+from enemy import ENEMY_TYPES, MOTION_PATH
+from cluster_handler import FORMATIONS
+from paths import PATHS
+
+# This file holds the levels, the scripts saying which enemies come in and when
+# A level is a JSON file listing its waves; a wave starts when every plane of the one before is gone
+# (after the last wave the level starts over, unless "loop" is false, in which case clearing it wins the game)
+# and each wave is a list of spawn events:
+#
+#     {
+#         "name": "example",
+#         "loop": true,
+#         "waves": [
+#             {"events": [
+#                 {"enemy": "RegularEnemy", "formation": "random_walk"},
+#                 {"enemy": "RedEnemy", "formation": "v", "count": 5, "path": "figure_eight", "frame": 90},
+#                 {"enemy": "Bombardier", "x": 100, "frame": 300, "repeat": 3, "interval": 60}
+#             ]},
+#             {"events": [{"enemy": "SuperBombardier"}]}
+#         ]
+#     }
+#
+# An event spawns one plane of the enemy type (by its name in enemy.py) at x, y, or a whole formation of
+# count planes (the cluster's random size by default) laid out in one of the shapes of cluster_handler.FORMATIONS
+# path picks another flight path from paths.py for enemies which follow one
+# frame is when the event happens, in frames after the start of the wave, repeat and interval turn it into
+# several events interval frames apart
+#
+# The events happening as the wave starts are built ahead of time, while the wave before is still played
+# The later ones are compiled into a priority queue (a heap) ordered by frame when the level is loaded,
+# so the game only looks at the top of the queue every frame and pops an event in O(log n) when it is due,
+# however long the level is
+
+# Folder of this file, the default level is found from it
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LEVEL = os.path.join(HERE, "Assets", "level.json")
+
+# Enemy types by name
+ENEMIES = {enemy_type.name: enemy_type for enemy_type in ENEMY_TYPES}
+
+# Keys an event may have
+EVENT_KEYS = {"enemy", "formation", "count", "path", "x", "y", "frame", "repeat", "interval"}
+
+
+class SpawnEvent:
+    # One plane or one formation to spawn
+    def __init__(self, enemy_type, formation=None, count=None, path=None, x=0, y=0, frame=0):
+        self.enemy_type = enemy_type
+        # Name of the formation shape, None for a single plane
+        self.formation = formation
+        # Planes in the formation, None for the cluster's own size
+        self.count = count
+        # Name of the flight path, None for the enemy type's own
+        self.path = path
+        # Where a single plane appears
+        self.x = x
+        self.y = y
+        # Frames after the start of the wave
+        self.frame = frame
+
+
+class Wave:
+    # The spawn events of a wave, split into the ones happening as it starts and the later ones
+    def __init__(self, events):
+        # Events at frame 0, in the order they are listed
+        self.opening = [event for event in events if event.frame == 0]
+        # The later events, numbered in the order they are listed (which breaks ties between events of the
+        # same frame), and the heap of (frame, number) every play of the wave starts with
+        self.timed = [event for event in events if event.frame > 0]
+        self.queue = [(event.frame, number) for number, event in enumerate(self.timed)]
+        heapq.heapify(self.queue)
+
+    def schedule(self):
+        # Returns a new queue of the later events, a copy of a heap is still a heap
+        return list(self.queue)
+
+
+class Level:
+    # The waves of a level, compiled from its description
+    def __init__(self, name, waves, loop=True):
+        if not waves:
+            raise ValueError(f"level {name!r} has no waves")
+        self.name = name
+        self.waves = waves
+        # Whether the first wave comes back after the last one, otherwise clearing the last one wins the game
+        self.loop = loop
+
+    def __len__(self):
+        return len(self.waves)
+
+    def __getitem__(self, wave):
+        return self.waves[wave]
+
+    @staticmethod
+    def from_dict(data, name="level"):
+        # Checks and compiles a level description (the contents of a level file)
+        name = data.get("name", name)
+        waves = []
+        for number, wave in enumerate(data.get("waves", [])):
+            events = []
+            for event in wave.get("events", []):
+                events += compile_event(event, f"{name} wave {number}")
+            if not events:
+                raise ValueError(f"{name} wave {number} has no events")
+            waves.append(Wave(events))
+        return Level(name, waves, data.get("loop", True))
+
+    @staticmethod
+    def load(path=DEFAULT_LEVEL):
+        # Reads a level file
+        with open(path) as file:
+            data = json.load(file)
+        return Level.from_dict(data, os.path.splitext(os.path.basename(path))[0])
+
+
+def compile_event(data, where):
+    # Checks an event description and returns its events (several when it repeats)
+    unknown = set(data) - EVENT_KEYS
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {sorted(unknown)}")
+    if data.get("enemy") not in ENEMIES:
+        raise ValueError(f"{where}: unknown enemy {data.get('enemy')!r}, expected one of {sorted(ENEMIES)}")
+    enemy_type = ENEMIES[data["enemy"]]
+
+    formation = data.get("formation")
+    if formation is not None and formation not in FORMATIONS:
+        raise ValueError(f"{where}: unknown formation {formation!r}, expected one of {sorted(FORMATIONS)}")
+    count = data.get("count")
+    if count is not None and (formation is None or count < 1):
+        raise ValueError(f"{where}: count needs a formation and at least 1 plane")
+    path = data.get("path")
+    if path is not None and (path not in PATHS or enemy_type.motion != MOTION_PATH):
+        raise ValueError(f"{where}: path {path!r} needs an enemy following a path and one of {sorted(PATHS)}")
+
+    frame = data.get("frame", 0)
+    repeat = data.get("repeat", 1)
+    interval = data.get("interval", 0)
+    if frame < 0 or repeat < 1 or interval < 0:
+        raise ValueError(f"{where}: frame, repeat and interval can't be negative")
+    return [
+        SpawnEvent(enemy_type, formation, count, path, data.get("x", 0), data.get("y", 0), frame + k * interval)
+        for k in range(repeat)
+    ]
@@ -0,0 +1,67 @@
+from time import perf_counter
+
+# This file holds the fixed timestep loop which keeps the game running at the same speed under load
+# Real time is collected in an accumulator and the game is updated once for every full step of
+# simulation time in it, so when drawing falls behind several updates run before the next draw
+# instead of the whole game slowing down
+
+
+class FixedTimestepLoop:
+    # Runs a tick function at a fixed rate, independent of how often frames are drawn
+    def __init__(self, tick, draw, steps_per_second=30, max_catch_up=5):
+        # tick advances the game by one step, draw renders the current state
+        self.tick = tick
+        self.draw_function = draw
+
+        # Length of one simulation step in seconds
+        self.step_time = 1 / steps_per_second
+        # Most steps run before a draw, if the game is further behind than that the time is dropped
+        # so one slow frame can't snowball into ever longer catch ups
+        self.max_catch_up = max_catch_up
+
+        # Real time not yet simulated
+        self.accumulator = 0.0
+        self.last_time = None
+
+        # Metrics: steps simulated, frames drawn, steps that were not drawn (render skipping)
+        # and steps dropped because the catch up limit was reached
+        self.steps = 0
+        self.renders = 0
+        self.dropped_steps = 0
+
+    def update(self):
+        # Called once per displayed frame (by pyxel.run), runs as many steps as real time asks for
+        now = perf_counter()
+        if self.last_time is None:
+            # First frame, run a single step
+            self.last_time = now
+            self.accumulator = self.step_time
+        self.accumulator += now - self.last_time
+        self.last_time = now
+
+        steps = 0
+        while self.accumulator >= self.step_time and steps < self.max_catch_up:
+            self.tick()
+            self.accumulator -= self.step_time
+            steps += 1
+        self.steps += steps
+
+        if self.accumulator >= self.step_time:
+            # Too far behind, the time that could not be caught up with is thrown away
+            dropped = int(self.accumulator // self.step_time)
+            self.dropped_steps += dropped
+            self.accumulator -= dropped * self.step_time
+
+    def draw(self):
+        # Called once per displayed frame (by pyxel.run)
+        self.draw_function()
+        self.renders += 1
+
+    def stats(self):
+        # Returns the loop metrics as a dictionary
+        return {
+            "steps": self.steps,
+            "renders": self.renders,
+            "skipped_renders": max(0, self.steps - self.renders),
+            "dropped_steps": self.dropped_steps,
+        }
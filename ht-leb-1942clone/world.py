@@ -0,0 +1,424 @@
+import numpy as np
+import pyxel
+from enemy import ENEMY_TYPES, MOTION_DIAGONAL, MOTION_PATH, MOTION_SQUARE, MOTION_CRISS_CROSS
+from patterns import PATTERN_LIST, PATTERNS
+from targeting import AIMS
+from paths import PATH_TABLES, PATHS
+
+# This file holds the world, the home of every enemy plane
+# Instead of one object per plane, each attribute (component) of the planes is kept in its own numpy array:
+# position, velocity, sprite, health, bullet pattern and score value, slot i of every array belonging to plane i
+# Systems then run over whole arrays at once (aiming, firing, moving, leaving the screen)
+# and the enemy type only decides which numbers go in the arrays, so the game loop never has to
+# check which kind of plane or which wave it is dealing with
+
+# Directions a criss-crossing plane can turn to when it reaches an edge, by edge
+# Each rule is (edge reached, directions moving into that edge, directions it picks from)
+CRISS_CROSS_TURNS = [
+    ("bottom", [[0, 1], [-1, 1], [-1, 0]], [[0, -1], [1, -1], [1, 0]]),
+    ("right", [[1, 0], [1, 1], [0, 1]], [[-1, 0], [-1, -1], [0, -1]]),
+    ("top", [[0, -1], [1, -1], [1, 0]], [[0, 1], [-1, 1], [-1, 0]]),
+    ("left", [[-1, 0], [-1, -1], [0, -1]], [[1, 0], [1, 1], [0, 1]]),
+]
+
+
+class World:
+    # Struct of arrays holding every enemy plane, the planes always sit in slots 0 to count - 1
+    def __init__(self, rng, bullets, capacity=16):
+        # Random number generator of the game, so every random choice can be replayed from the seed
+        self.rng = rng
+        # Store every plane fires its bullets into, it belongs to the game so the bullets outlive the planes
+        # (and the world), they are moved, tested and drawn by the game
+        self.bullets = bullets
+        self.count = 0
+
+        # Enemy type (its id) and whether the plane is alive, dead planes are removed by compact()
+        self.kind = np.zeros(capacity, dtype=np.int16)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        # Position and size
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.width = np.zeros(capacity, dtype=np.int16)
+        self.height = np.zeros(capacity, dtype=np.int16)
+
+        # Velocity, a direction (like a unit vector) multiplied by a speed
+        self.direction_x = np.zeros(capacity, dtype=np.float64)
+        self.direction_y = np.zeros(capacity, dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        # Motion system moving the plane, and its state: whether the direction is set,
+        # and the flight path (index in PATH_TABLES) with its centre (origin x, origin y) and radius
+        self.motion = np.zeros(capacity, dtype=np.int8)
+        self.direction_fixed = np.zeros(capacity, dtype=bool)
+        self.path = np.zeros(capacity, dtype=np.int8)
+        self.origin_x = np.zeros(capacity, dtype=np.float64)
+        self.origin_y = np.zeros(capacity, dtype=np.float64)
+        self.radius = np.zeros(capacity, dtype=np.float64)
+        self.dies_off_screen = np.zeros(capacity, dtype=bool)
+
+        # Sprite coordinates in image bank 0
+        self.u = np.zeros(capacity, dtype=np.int16)
+        self.v = np.zeros(capacity, dtype=np.int16)
+
+        # Health and score value
+        self.health = np.zeros(capacity, dtype=np.int32)
+        self.points = np.zeros(capacity, dtype=np.int32)
+
+        # Bullet pattern fired (index in PATTERN_LIST), how often, how fast its bullets are,
+        # how the plane aims (see targeting.py) and the direction it aims in
+        self.pattern = np.zeros(capacity, dtype=np.int8)
+        self.shoot_speed = np.zeros(capacity, dtype=np.int32)
+        self.bullet_speed = np.zeros(capacity, dtype=np.float64)
+        self.aim_mode = np.zeros(capacity, dtype=np.int8)
+        self.aim_x = np.zeros(capacity, dtype=np.float64)
+        self.aim_y = np.zeros(capacity, dtype=np.float64)
+
+        # Formation the plane flies in (-1 for none), whether it leads it and, for the other planes of the
+        # formation (the followers), their offset from the leader
+        self.formation = np.zeros(capacity, dtype=np.int32)
+        self.leader = np.zeros(capacity, dtype=bool)
+        self.offset_x = np.zeros(capacity, dtype=np.float64)
+        self.offset_y = np.zeros(capacity, dtype=np.float64)
+        # Number given to the next formation
+        self.next_formation = 0
+
+    def __len__(self):
+        return self.count
+
+    def arrays(self):
+        # All the per plane arrays, in the order they are declared
+        return [
+            self.kind, self.alive, self.x, self.y, self.width, self.height,
+            self.direction_x, self.direction_y, self.speed, self.motion, self.direction_fixed, self.path,
+            self.origin_x, self.origin_y, self.radius, self.dies_off_screen, self.u, self.v,
+            self.health, self.points, self.pattern, self.shoot_speed, self.bullet_speed, self.aim_mode, self.aim_x, self.aim_y,
+            self.formation, self.leader, self.offset_x, self.offset_y,
+        ]
+
+    def reserve(self, extra):
+        # Makes sure there is room for extra more planes, doubling the arrays when they are full
+        needed = self.count + extra
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, array in vars(self).items():
+            if isinstance(array, np.ndarray):
+                setattr(self, name, np.concatenate((array, np.zeros(capacity - len(array), dtype=array.dtype))))
+
+    def spawn(self, enemy_type, x, y, path=None):
+        # Adds a plane of the given type at x, y and returns its slot
+        # path is the name of a flight path replacing the enemy type's own
+        self.reserve(1)
+        i = self.count
+        self.kind[i] = enemy_type.id
+        self.alive[i] = True
+        self.x[i] = x
+        self.y[i] = y
+        self.width[i] = enemy_type.width
+        self.height[i] = enemy_type.height
+        # Every plane starts off moving down
+        self.direction_x[i] = 1 if enemy_type.motion == MOTION_DIAGONAL else 0
+        self.direction_y[i] = 1
+        self.speed[i] = enemy_type.speed
+        self.motion[i] = enemy_type.motion
+        self.direction_fixed[i] = False
+        path = path or enemy_type.path
+        self.path[i] = PATHS[path] if path is not None else 0
+        self.origin_x[i] = x
+        self.origin_y[i] = y
+        self.radius[i] = enemy_type.radius
+        self.dies_off_screen[i] = enemy_type.dies_off_screen
+        self.u[i] = enemy_type.u
+        self.v[i] = enemy_type.v
+        self.health[i] = enemy_type.health
+        self.points[i] = enemy_type.points
+        self.pattern[i] = PATTERNS[enemy_type.pattern].id
+        self.shoot_speed[i] = enemy_type.shoot_speed
+        self.bullet_speed[i] = enemy_type.bullet_speed
+        self.aim_mode[i] = enemy_type.aim
+        self.aim_x[i] = 0
+        self.aim_y[i] = 0
+        self.formation[i] = -1
+        self.leader[i] = False
+        self.offset_x[i] = 0
+        self.offset_y[i] = 0
+        self.count += 1
+        return i
+
+    def spawn_formation(self, enemy_type, x, y, offsets, path=None):
+        # Adds a formation: a leader at x, y and a follower at every (x, y) offset from it
+        # Only the leader runs its motion system, the followers keep their offset from it
+        # Returns the number of the formation
+        for formation in self.build_formation(enemy_type, x, y, offsets, path=path):
+            pass
+        return formation
+
+    def build_formation(self, enemy_type, x, y, offsets, built=0, path=None):
+        # Same as spawn_formation() but as a generator which yields the formation number after every plane,
+        # so a big formation can be built a few planes at a time over several frames
+        # built is the number of planes of the formation already in the world, to carry on with a
+        # formation whose build was interrupted (by restoring a snapshot)
+        if built == 0:
+            formation = self.next_formation
+            self.next_formation += 1
+            leader = self.spawn(enemy_type, x, y, path)
+            self.formation[leader] = formation
+            self.leader[leader] = True
+            yield formation
+        else:
+            formation = self.next_formation - 1
+        for offset_x, offset_y in offsets[max(built - 1, 0):]:
+            follower = self.spawn(enemy_type, x + offset_x, y + offset_y, path)
+            self.formation[follower] = formation
+            self.offset_x[follower] = offset_x
+            self.offset_y[follower] = offset_y
+            yield formation
+
+    def type_of(self, i):
+        # Returns the EnemyType of the plane in slot i
+        return ENEMY_TYPES[self.kind[i]]
+
+    def hitboxes(self, hitboxes):
+        # Returns the x, y, width and height arrays of the tight boxes around the solid pixels of every plane,
+        # on the whole pixels the planes are drawn at
+        n = self.count
+        edges = hitboxes.enemy_kinds().edges[self.kind[:n]]
+        return np.floor(self.x[:n]) + edges[:, 0], np.floor(self.y[:n]) + edges[:, 1], edges[:, 2], edges[:, 3]
+
+    def kill(self, i):
+        # Marks a plane as dead, it stops being drawn and colliding straight away
+        self.alive[i] = False
+
+    def clear(self):
+        # Removes every plane, the bullets they fired keep flying
+        self.count = 0
+
+    def compact(self):
+        # Packs the living planes into the front of the arrays, keeping their order
+        n = self.count
+        keep = np.flatnonzero(self.alive[:n])
+        m = len(keep)
+        if m == n:
+            return
+        # Formations losing their leader get a new one before it is removed
+        for i in np.flatnonzero(self.leader[:n] & ~self.alive[:n]).tolist():
+            self.promote(i)
+        for array in self.arrays():
+            array[:m] = array[keep]
+        self.count = m
+
+    def promote(self, old_leader):
+        # Makes the first living follower the leader of the dead leader's formation
+        # It takes over the leader's motion where it left it, so the formation carries on as before
+        n = self.count
+        followers = np.flatnonzero((self.formation[:n] == self.formation[old_leader]) & self.alive[:n] & ~self.leader[:n])
+        self.leader[old_leader] = False
+        if len(followers) == 0:
+            return
+        i = followers[0]
+        self.leader[i] = True
+        self.direction_x[i] = self.direction_x[old_leader]
+        self.direction_y[i] = self.direction_y[old_leader]
+        self.direction_fixed[i] = self.direction_fixed[old_leader]
+        # The centre of its flight path moves by its offset from the old leader
+        self.origin_x[i] = self.origin_x[old_leader] + self.offset_x[i]
+        self.origin_y[i] = self.origin_y[old_leader] + self.offset_y[i]
+        # The other followers are now placed relative to the new leader
+        self.offset_x[followers] -= self.offset_x[i]
+        self.offset_y[followers] -= self.offset_y[i]
+
+    def update(self, frame_count, targets):
+        # Runs every system once, frame_count times the shooting and motion of the planes
+        # and targets are the player planes still in the game
+        if self.count == 0:
+            return
+        # Planes which crashed into the player are removed first, so their formation can't follow them
+        self.compact()
+        self.aim(targets)
+        self.fire(frame_count)
+        self.move(frame_count)
+        self.follow()
+        self.leave_screen()
+        self.compact()
+
+    # Systems
+
+    def aim(self, targets):
+        # Points every plane at the nearest of the player planes in targets, the planes sharing an aim
+        # are all aimed at once, with no targets left the planes keep their last aim
+        n = self.count
+        if not targets:
+            return
+        target_x = np.array([target.x for target in targets], dtype=np.float64)
+        target_y = np.array([target.y for target in targets], dtype=np.float64)
+        target_vx = np.array([target.vx for target in targets], dtype=np.float64)
+        target_vy = np.array([target.vy for target in targets], dtype=np.float64)
+        if len(targets) == 1:
+            nearest = np.zeros(n, dtype=np.intp)
+        else:
+            distance = (target_x[None, :] - self.x[:n, None]) ** 2 + (target_y[None, :] - self.y[:n, None]) ** 2
+            nearest = np.argmin(distance, axis=1)
+        dx = target_x[nearest] - self.x[:n]
+        dy = target_y[nearest] - self.y[:n]
+        vx = target_vx[nearest]
+        vy = target_vy[nearest]
+        aims = self.aim_mode[:n]
+        # Only the aims in use are run, a wave rarely has more than one
+        for aim in np.unique(aims).tolist():
+            slots = np.flatnonzero(aims == aim)
+            self.aim_x[slots], self.aim_y[slots] = AIMS[aim](
+                dx[slots], dy[slots], vx[slots], vy[slots], self.bullet_speed[slots]
+            )
+
+    def fire(self, frame_count):
+        # Fires the bullet pattern of every living plane whose shooting time has come
+        # The bullets of all the planes firing the same pattern are worked out together and added
+        # to the bullet store in one batch
+        n = self.count
+        alive = self.alive[:n]
+        patterns = self.pattern[:n]
+        # Only the patterns in use are run (in the order of PATTERN_LIST), a wave rarely has more than one
+        for pattern_id in np.unique(patterns[alive]).tolist():
+            pattern = PATTERN_LIST[pattern_id]
+            group = np.flatnonzero(alive & (patterns == pattern_id))
+            firing = group[pattern.firing(frame_count, self.shoot_speed[group])]
+            if len(firing) == 0:
+                continue
+            x, y, direction_x, direction_y = pattern.emit(
+                self.x[firing], self.y[firing], self.width[firing], self.height[firing],
+                self.aim_x[firing], self.aim_y[firing], self.shoot_speed[firing], frame_count,
+            )
+            directions = np.column_stack((direction_x, direction_y))
+            speed = np.repeat(self.bullet_speed[firing], pattern.count)
+            self.bullets.spawn_many(x, y, pattern.u, pattern.v, directions, speed)
+
+    def move(self, frame_count):
+        # Runs the motion system of every kind of motion present in the world
+        # Followers are skipped, they are moved with their leader by follow()
+        n = self.count
+        motions = self.motion[:n]
+        moving = self.alive[:n] & ((self.formation[:n] < 0) | self.leader[:n])
+        # Only the motions in use are run (in the order of their numbers), a wave rarely has more than one
+        for motion in np.unique(motions[moving]).tolist():
+            MOTIONS[motion](self, np.flatnonzero((motions == motion) & moving), frame_count)
+
+    def follow(self):
+        # Puts every follower at its offset from the leader of its formation, all in one go
+        n = self.count
+        formation = self.formation[:n]
+        followers = np.flatnonzero((formation >= 0) & ~self.leader[:n])
+        if len(followers) == 0:
+            return
+        leaders = np.flatnonzero(self.leader[:n])
+        # Leader of every follower, found by looking up its formation number among the leaders' ones
+        order = np.argsort(formation[leaders])
+        found = np.searchsorted(formation[leaders], formation[followers], sorter=order)
+        leader_of = leaders[order[found]]
+        self.x[followers] = self.x[leader_of] + self.offset_x[followers]
+        self.y[followers] = self.y[leader_of] + self.offset_y[followers]
+
+    def leave_screen(self):
+        # Kills the planes which left the screen, the bounds depend on the size of the plane
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        outside = (x < 0) | (y < 0) | (x > pyxel.width - self.width[:n]) | (y > pyxel.height - self.height[:n])
+        self.alive[:n] &= ~(outside & self.dies_off_screen[:n])
+
+    def draw(self):
+        # Draws every living plane
+        for i in np.flatnonzero(self.alive[:self.count]).tolist():
+            pyxel.blt(self.x[i], self.y[i], 0, self.u[i], self.v[i], self.width[i], self.height[i], 0)
+
+
+# Motion systems, each one moves the planes in the given slots
+
+def move_diagonal(world, slots, frame_count):
+    # Planes which reach midway through the screen (vertically) pick a direction once:
+    # carrying on down or turning up, chosen at random
+    y = world.y[slots]
+    turning = slots[~world.direction_fixed[slots] & (y > pyxel.height / 2 - world.height[slots])]
+    for i in turning.tolist():
+        world.direction_y[i] = [-1, 1][world.rng.randint(0, 1)]
+        world.direction_fixed[i] = True
+
+    world.x[slots] += world.direction_x[slots] * world.speed[slots]
+    world.y[slots] += world.direction_y[slots] * world.speed[slots]
+
+
+def move_path(world, slots, frame_count):
+    # The planes follow their flight path around a centre which starts where they were spawned
+    # and drifts to the right with time
+    # Every plane on a path shares the same offset this frame, so it is looked up once per path
+    paths = world.path[slots]
+    drift = frame_count % pyxel.width
+    for path, table in enumerate(PATH_TABLES):
+        group = slots[paths == path]
+        if len(group) == 0:
+            continue
+        offset_x, offset_y = table.offset(frame_count)
+        world.x[group] = drift + world.origin_x[group] + offset_x * world.radius[group]
+        world.y[group] = world.origin_y[group] + offset_y * world.radius[group]
+
+
+def move_square(world, slots, frame_count):
+    # Square motion, the plane turns clockwise (down, right, up, left) when it reaches the side of its square
+    world.x[slots] += world.direction_x[slots] * world.speed[slots]
+    world.y[slots] += world.direction_y[slots] * world.speed[slots]
+
+    x = world.x[slots]
+    y = world.y[slots]
+    dx = world.direction_x[slots]
+    dy = world.direction_y[slots]
+    turn = (
+        ((dy > 0) & (y >= pyxel.height / 2 - world.height[slots]))
+        | ((dx > 0) & (x >= pyxel.width - world.width[slots]))
+        | ((dy < 0) & (y <= 0))
+        | ((dx < 0) & (x <= 0))
+    )
+    # Turning clockwise takes (dx, dy) to (dy, -dx)
+    world.direction_x[slots] = np.where(turn, dy, dx)
+    world.direction_y[slots] = np.where(turn, -dx, dy)
+
+
+def move_criss_cross(world, slots, frame_count):
+    # Criss-crosses the top half of the screen, at every edge a new direction is picked at random
+    world.x[slots] += world.direction_x[slots] * world.speed[slots]
+    world.y[slots] += world.direction_y[slots] * world.speed[slots]
+
+    x = world.x[slots]
+    y = world.y[slots]
+    at_edge = (
+        (y >= pyxel.height / 2 - world.height[slots])
+        | (x >= pyxel.width - world.width[slots])
+        | (y <= 0)
+        | (x <= 0)
+    )
+    # Only the few planes at an edge are turned, one by one in slot order so the random choices replay
+    for i in slots[at_edge].tolist():
+        direction = [int(world.direction_x[i]), int(world.direction_y[i])]
+        reached = {
+            "bottom": world.y[i] >= pyxel.height / 2 - world.height[i],
+            "right": world.x[i] >= pyxel.width - world.width[i],
+            "top": world.y[i] <= 0,
+            "left": world.x[i] <= 0,
+        }
+        for edge, moving, choices in CRISS_CROSS_TURNS:
+            if reached[edge] and direction in moving:
+                world.direction_x[i], world.direction_y[i] = choices[world.rng.randint(0, 2)]
+                break
+
+    # The plane never leaves the screen
+    world.x[slots] = np.clip(world.x[slots], 0, pyxel.width - world.width[slots])
+    world.y[slots] = np.clip(world.y[slots], 0, pyxel.height - world.height[slots])
+
+
+# Motion system of every kind of motion
+MOTIONS = {
+    MOTION_DIAGONAL: move_diagonal,
+    MOTION_PATH: move_path,
+    MOTION_SQUARE: move_square,
+    MOTION_CRISS_CROSS: move_criss_cross,
+}